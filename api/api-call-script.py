@@ -1,20 +1,26 @@
 import requests
+import os
 import sys
 import json
 
-# Base Invoke URL (ends with /prod)
-BASE_URL = "https://pfc4s34m21.execute-api.ap-southeast-1.amazonaws.com/prod"
+from http_cache import HttpCache
+
+# Base Invoke URL (ends with /prod); set DATAPORTAL_BASE_URL to use local_server.py instead
+BASE_URL = os.environ.get("DATAPORTAL_BASE_URL", "https://pfc4s34m21.execute-api.ap-southeast-1.amazonaws.com/prod")
 # Resource path
 RESOURCE_PATH = "/csv"
 # Full API endpoint
 API_ENDPOINT = BASE_URL + RESOURCE_PATH
 
-# API Key (replace with your actual API key)
-API_KEY = "your_api_key_here"
+# API Key (replace with your actual API key or set DATAPORTAL_API_KEY)
+API_KEY = os.environ.get("DATAPORTAL_API_KEY", "your_api_key_here")
+
+# Local cache of responses; unchanged files are answered with 304 Not Modified and no body
+CACHE = HttpCache()
 
-def get_csv_data(file_name, period='all'):
+def get_csv_data(file_name, period='all', use_cache=True, since=None):
     print(f"Attempting to access file: {file_name}")
-    print(f"Period: {period}")
+    print(f"Period: {period}" if since is None else f"Rows after: {since}")
     print(f"Using API endpoint: {API_ENDPOINT}")
     
     headers = {
@@ -25,11 +31,18 @@ def get_csv_data(file_name, period='all'):
         'file': file_name,
         'period': period
     }
+    if since is not None:
+        params['since'] = since
     
     try:
-        response = requests.get(API_ENDPOINT, params=params, headers=headers, timeout=10)
+        if use_cache:
+            response = CACHE.get(API_ENDPOINT, params=params, headers=headers, timeout=10)
+        else:
+            response = requests.get(API_ENDPOINT, params=params, headers=headers, timeout=10)
         
         print(f"Request URL: {response.url}")
+        if getattr(response, 'from_cache', False):
+            print("Data unchanged since the last call, served from the local cache")
         print(f"Response status code: {response.status_code}")
         print(f"Response headers: {json.dumps(dict(response.headers), indent=2)}")
         
@@ -56,9 +69,13 @@ if __name__ == "__main__":
     if len(sys.argv) < 2 or len(sys.argv) > 3:
         print("Usage: python3 api_call.py <file_name> [period]")
         print("Period can be 'day', 'week', 'fortnight', or 'all' (default)")
+        print("or a date (2024-05-01) or epoch seconds to get only the rows after it")
         sys.exit(1)
     
     file_name = sys.argv[1]
     period = sys.argv[2] if len(sys.argv) == 3 else 'all'
     
-    get_csv_data(file_name, period)
+    if period in ('day', 'week', 'fortnight', 'all'):
+        get_csv_data(file_name, period)
+    else:
+        get_csv_data(file_name, since=period)
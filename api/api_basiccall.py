@@ -4,49 +4,92 @@ Created on Sun Jun 23 16:04:39 2024
 
 @author: tom
 """
-import pandas as pd
-import os.path
-import sys
-from flask import Flask, jsonify, request
+import time
+
+from flask import Flask, Response, g, jsonify, request
 from flask_restplus import Api, Resource, fields
 
+import metrics
+from timeseries_store import TimeSeriesStore
+
 app = Flask(__name__)
 api = Api(app, version='1.0', title='Time Series API',
           description='A simple Time Series API')
 
 ns = api.namespace('data', description='Time series operations')
 
-# Sample time series data
-modpath = os.path.dirname(os.path.abspath(sys.argv[0])) 
-datapath = os.path.join(modpath, '../../dataportal/tokens/SNEK.csv') 
-# Read CSV file into a DataFrame
-time_series_data = pd.read_csv('data.csv')
-time_series_data.set_index('date', inplace=True)
+# All token CSVs of ../tokens, held in memory as sorted date arrays
+store = TimeSeriesStore()
+metrics.track_cache('flask', 'rows', store)
 
 date_model = api.model('DateModel', {
     'date': fields.String(required=True, description='The date'),
 })
 
+
+def query_data(args):
+    """
+    Answer a query from pre-serialized JSON.
+
+    ?date=2024-02-01[&ticker=SNEK]            -> {date: row}
+    ?tickers=WMT,SNEK&date=2024-02-01         -> {ticker: [row], ...} ([] for a ticker without that date)
+    ?ticker=SNEK&start=2024-01-01&end=...     -> {ticker: [rows]} (start and end optional, inclusive)
+    ?tickers=WMT,AGIX,SNEK&start=...&end=...  -> {ticker: [rows], ...}
+    """
+    tickers = [t.strip() for t in args.get('tickers', args.get('ticker', 'SNEK')).split(',') if t.strip()]
+    unknown = [t for t in tickers if t not in store.series]
+    if unknown:
+        return jsonify({"error": f"Unknown ticker: {', '.join(unknown)}", "tickers": sorted(store.series)}), 404
+    try:
+        if 'date' in args and 'tickers' in args:
+            # Several tickers need their name in the response, so use the range layout for one day
+            body = store.range_json(tickers, args['date'], args['date'])
+        elif 'date' in args:
+            body = store.point_json(tickers[0], args['date'])
+            if body is None:
+                return jsonify({"error": "Date not found"}), 404
+        else:
+            body = store.range_json(tickers, args.get('start'), args.get('end'))
+    except ValueError:
+        return jsonify({"error": "Invalid date, use YYYY-MM-DD"}), 400
+    return Response(body, mimetype='application/json')
+
+
 @ns.route('/')
 class DataResource(Resource):
-    @api.doc(params={'date': 'The date for the data'})
+    @api.doc(params={'date': 'The date for the data', 'ticker': 'Token ticker (default SNEK)',
+                     'tickers': 'Comma separated tickers', 'start': 'First date of a range',
+                     'end': 'Last date of a range'})
     @api.response(200, 'Success')
-    @api.response(404, 'Date not found')
+    @api.response(400, 'Invalid date')
+    @api.response(404, 'Date or ticker not found')
     def get(self):
-        """Fetch the data for a given date"""
-        date = request.args.get('date')
-        if date in time_series_data:
-            return jsonify({date: time_series_data[date]})
-        else:
-            return jsonify({"error": "Date not found"}), 404
+        """Fetch the data for a given date or date range"""
+        return query_data(request.args)
         
 @app.route('/data', methods=['GET'])
 def get_data():
-    date = request.args.get('date')
-    if date in time_series_data:
-        return jsonify({date: time_series_data[date]})
-    else:
-        return jsonify({"error": "Date not found"}), 404
+    return query_data(request.args)
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request, cache and latency metrics in the Prometheus text format"""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.before_request
+def start_timer():
+    g.start = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    # Label by route template (e.g. /data/), never by the raw URL with its query values
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.record_request('flask', endpoint, response.status_code, time.perf_counter() - g.start,
+                           response.calculate_content_length() or 0, request.headers.get('x-api-key'))
+    return response
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
@@ -0,0 +1,152 @@
+import argparse
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Path, Query
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response
+
+import metrics
+import timeseries_store
+from candle_stream import CSVWatcher, broker, router as stream_router
+from transport import GZIP_MIN_SIZE
+
+# Folder with the token CSVs (default: ../tokens)
+DATA_DIR = os.environ.get("DATAPORTAL_DATA_DIR", timeseries_store.DATA_DIR)
+
+# All token CSVs, loaded once per worker and shared by every request
+store = timeseries_store.TimeSeriesStore(DATA_DIR)
+metrics.track_cache('asgi', 'rows', store)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Watch the CSVs for live candles; changed files are parsed in a worker thread and swapped into the store
+    watcher = CSVWatcher(broker, DATA_DIR, load=store.read, on_change=store.install)
+    # One scan before serving, so /stream knows every ticker from the first request on
+    watcher.apply(await asyncio.to_thread(watcher.poll))
+    task = asyncio.create_task(watcher.run())
+    yield
+    task.cancel()
+
+
+app = FastAPI(title='Dataportal Time Series API', version='2.0', lifespan=lifespan,
+              description='Cleaned Cardano native token time series: single tickers, date ranges and '
+                          'batches of tickers in one request, and live candle updates. Dates are YYYY-MM-DD.')
+# Range and batch responses are large and compress well
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE)
+# Added last, so it wraps the GZip middleware and counts the bytes actually sent
+app.add_middleware(metrics.ASGIMetricsMiddleware, label='asgi')
+app.include_router(stream_router)
+
+ROWS_EXAMPLE = {'SNEK': [{'date': '2024-02-01', 'open': 0.002129, 'high': 0.002132, 'low': 0.001986,
+                          'close': 0.002081, 'volume': 933409.57}]}
+
+# The handlers are async and never block: every query is two binary searches over in-memory arrays
+# and a join of pre-serialized rows, so it runs on the event loop without a thread pool hop.
+
+
+def _json(body):
+    return Response(body, media_type='application/json')
+
+
+def _tickers(files):
+    # Accepts 'WMT,AGIX,SNEK' as well as the file names of the CSV API ('WMT.csv,AGIX.csv')
+    tickers = [name.strip() for name in files.split(',') if name.strip()]
+    # A ticker listed twice ('WMT,WMT.csv') would repeat its key in the JSON object
+    return list(dict.fromkeys(ticker[:-4] if ticker.endswith('.csv') else ticker for ticker in tickers))
+
+
+def _unknown(tickers):
+    unknown = [ticker for ticker in tickers if ticker not in store.series]
+    if unknown:
+        return JSONResponse({'error': f"Unknown ticker: {', '.join(unknown)}", 'tickers': sorted(store.series)},
+                            status_code=404)
+    return None
+
+
+def _invalid_date():
+    return JSONResponse({'error': "Invalid date, use YYYY-MM-DD"}, status_code=400)
+
+
+@app.get('/tickers', summary='Available tickers',
+         responses={200: {'content': {'application/json': {'example': {'SNEK': {
+             'first': '2023-05-02', 'last': '2025-08-20', 'rows': 842,
+             'columns': ['date', 'open', 'high', 'low', 'close', 'volume']}}}}}})
+async def list_tickers():
+    """First and last date, number of rows and columns of every ticker."""
+    return {ticker: {'first': series['labels'][0] if series['labels'] else None,
+                     'last': series['labels'][-1] if series['labels'] else None,
+                     'rows': len(series['labels']), 'columns': series['columns']}
+            for ticker, series in sorted(store.series.items())}
+
+
+@app.get('/data', summary='Batch of tickers',
+         responses={200: {'content': {'application/json': {'example': ROWS_EXAMPLE}}},
+                    400: {'description': 'Invalid date'}, 404: {'description': 'Unknown ticker'}})
+async def get_batch(files: str = Query(..., description='Comma separated tickers or file names, e.g. WMT,AGIX,SNEK',
+                                       examples=['WMT,AGIX,SNEK']),
+                    start: str = Query(None, description='First date (inclusive)'),
+                    end: str = Query(None, description='Last date (inclusive)')):
+    """Rows of many tickers in one round trip, e.g. all tokens of a dashboard."""
+    tickers = _tickers(files)
+    error = _unknown(tickers)
+    if error is not None:
+        return error
+    try:
+        return _json(store.range_json(tickers, start, end))
+    except ValueError:
+        return _invalid_date()
+
+
+@app.get('/data/{ticker}', summary='Date range of one ticker',
+         responses={200: {'content': {'application/json': {'example': ROWS_EXAMPLE}}},
+                    400: {'description': 'Invalid date'}, 404: {'description': 'Unknown ticker'}})
+async def get_range(ticker: str = Path(..., description='Ticker, e.g. SNEK'),
+                    start: str = Query(None, description='First date (inclusive, default: first row)'),
+                    end: str = Query(None, description='Last date (inclusive, default: last row)')):
+    """Rows of one ticker between start and end; the whole history without them."""
+    error = _unknown([ticker])
+    if error is not None:
+        return error
+    try:
+        return _json(store.range_json([ticker], start, end))
+    except ValueError:
+        return _invalid_date()
+
+
+@app.get('/data/{ticker}/{date}', summary='One day of one ticker',
+         responses={200: {'content': {'application/json': {'example': {'2024-02-01': ROWS_EXAMPLE['SNEK'][0]}}}},
+                    400: {'description': 'Invalid date'}, 404: {'description': 'Unknown ticker or date'}})
+async def get_point(ticker: str = Path(..., description='Ticker, e.g. SNEK'),
+                    date: str = Path(..., description='Date, e.g. 2024-02-01')):
+    """Row of one ticker on one date."""
+    error = _unknown([ticker])
+    if error is not None:
+        return error
+    try:
+        body = store.point_json(ticker, date)
+    except ValueError:
+        return _invalid_date()
+    if body is None:
+        return JSONResponse({'error': "Date not found"}, status_code=404)
+    return _json(body)
+
+
+@app.get('/metrics', include_in_schema=False)
+async def get_metrics():
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the time series API (OpenAPI docs on /docs)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes, each with its own store")
+    args = parser.parse_args()
+
+    # Workers need the import string, a single process can take the app object
+    uvicorn.run('asgi_app:app' if args.workers > 1 else app, host=args.host, port=args.port, workers=args.workers)
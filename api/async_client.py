@@ -0,0 +1,257 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+import aiohttp
+
+from transport import FORMATS, decode
+
+# Base Invoke URL (ends with /prod); set DATAPORTAL_BASE_URL to test against a local server
+BASE_URL = os.environ.get("DATAPORTAL_BASE_URL", "https://pfc4s34m21.execute-api.ap-southeast-1.amazonaws.com/prod")
+# Resource path
+RESOURCE_PATH = "/csv"
+# Full API endpoint
+API_ENDPOINT = BASE_URL + RESOURCE_PATH
+
+# API Key (replace with your actual API key or set DATAPORTAL_API_KEY)
+API_KEY = os.environ.get("DATAPORTAL_API_KEY", "your_api_key_here")
+
+TICKERS = ['AGIX', 'BOOK', 'COPI', 'EMP', 'FLDT', 'GENS', 'HUNT', 'IAG', 'INDY', 'LENFI',
+           'MELD', 'MILK', 'MIN', 'NEWM', 'NMKR', 'NTX', 'SNEK', 'SUNDAE', 'WMT', 'WRT']
+
+# Status codes worth retrying: rate limiting and server side errors
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0, retry_after=None):
+    """
+    Seconds to wait before the next attempt ("full jitter" exponential backoff).
+
+    :param attempt: Number of the failed attempt, starting at 0
+    :param base: Delay scale in seconds
+    :param cap: Maximum delay in seconds
+    :param retry_after: Value of a Retry-After header in seconds, used as the lower bound if given
+    """
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return delay
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+def last_date(path):
+    """Date of the last row of a stored CSV, or None if the file is missing or has no rows."""
+    try:
+        with open(path, 'rb') as f:
+            header = f.readline().strip()
+            f.seek(max(os.path.getsize(path) - 4096, 0))
+            lines = [line.strip() for line in f.read().splitlines() if line.strip()]
+    except OSError:
+        return None
+    if not lines or lines[-1] == header:
+        return None
+    return lines[-1].split(b',', 1)[0].decode('utf-8')
+
+
+async def _append_rows(response, path):
+    # Rows of a since= response, without the header, appended to the stored file
+    if response.content_type == 'application/json':
+        payload = await response.json(content_type=None)
+        data = payload['data'].encode('utf-8')
+    else:
+        data = await response.read()
+    rows = data.split(b'\n', 1)[1] if b'\n' in data else b''
+    if rows:
+        with open(path, 'ab') as f:
+            f.write(rows)
+    return len(rows)
+
+
+async def _write_body(response, path):
+    # Stream the body to a temporary file and move it into place, so a failed download never
+    # leaves a truncated CSV in the store. The Lambda wraps the CSV in {"data": ...}.
+    temporary = f"{path}.part"
+    size = 0
+    try:
+        if response.content_type == 'application/json':
+            payload = await response.json(content_type=None)
+            data = payload['data'] if isinstance(payload, dict) and 'data' in payload else json.dumps(payload)
+            with open(temporary, 'w', encoding='utf-8') as f:
+                size = f.write(data)
+        else:
+            with open(temporary, 'wb') as f:
+                async for chunk in response.content.iter_chunked(65536):
+                    size += f.write(chunk)
+        os.replace(temporary, path)
+    except BaseException:
+        # Also on cancellation: a dropped connection or timeout must not leave the partial file behind
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return size
+
+
+async def _get_with_retries(session, params, headers, semaphore, retries, api_endpoint, on_success, result):
+    # GET with jittered exponential backoff on 429/5xx and connection errors; on_success(response)
+    # consumes a 200 response and returns fields to add to the result dict
+    start = time.perf_counter()
+    for attempt in range(retries + 1):
+        result['attempts'] = attempt + 1
+        retry_after = None
+        try:
+            async with semaphore:
+                async with session.get(api_endpoint, params=params, headers=headers) as response:
+                    result['status'] = response.status
+                    if response.status == 200:
+                        result.update(await on_success(response))
+                        break
+                    if response.status not in RETRY_STATUS:
+                        result['error'] = (await response.text())[:200]
+                        break
+                    retry_after = _retry_after(response)
+                    result['error'] = f"HTTP {response.status}"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+        if attempt < retries:
+            await asyncio.sleep(backoff_delay(attempt, retry_after=retry_after))
+
+    if result['status'] == 200:
+        result.pop('error', None)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+async def fetch_csv(session, file_name, period='all', store_dir='data', semaphore=None, retries=5,
+                    api_endpoint=API_ENDPOINT, api_key=API_KEY, since=None):
+    """
+    Download one file and write it to the store, retrying on 429/5xx and connection errors.
+
+    :param session: Shared aiohttp.ClientSession
+    :param file_name: File on the API, e.g. 'WMT.csv' or 'S81.csv'
+    :param period: 'day', 'week', 'fortnight' or 'all'
+    :param store_dir: Directory the file is written to
+    :param semaphore: asyncio.Semaphore bounding the number of requests in flight
+    :param retries: Maximum number of retries after the first attempt
+    :param api_endpoint: Full URL of the /csv resource
+    :param api_key: API key sent as x-api-key
+    :param since: Only fetch the rows dated after this date and append them to the stored file
+    :return: Dict with file, status, bytes, attempts, seconds and path or error
+    """
+    params = {'file': file_name, 'period': period}
+    if since is not None:
+        params['since'] = since
+    # Plain CSV instead of the JSON wrapper, streamed straight to the file
+    headers = {"x-api-key": api_key, "Accept": "text/csv"}
+    path = os.path.join(store_dir, file_name)
+
+    async def write(response):
+        if since is None:
+            return {'bytes': await _write_body(response, path), 'path': path}
+        return {'bytes': await _append_rows(response, path), 'path': path}
+
+    result = {'file': file_name, 'status': None, 'bytes': 0, 'attempts': 0}
+    return await _get_with_retries(session, params, headers, semaphore or asyncio.Semaphore(1), retries,
+                                   api_endpoint, write, result)
+
+
+async def fetch_records(session, file_name, period='all', semaphore=None, retries=5, api_endpoint=API_ENDPOINT,
+                        api_key=API_KEY, since=None):
+    """
+    Fetch one file as a binary NumPy record array without any CSV parsing.
+
+    :return: Dict with file, status, attempts, seconds and records (structured array) or error
+    """
+    params = {'file': file_name, 'period': period}
+    if since is not None:
+        params['since'] = since
+    headers = {"x-api-key": api_key, "Accept": FORMATS['npy']}
+
+    async def parse(response):
+        content = await response.read()
+        return {'bytes': len(content), 'records': decode(content, response.headers.get('Content-Type'))}
+
+    result = {'file': file_name, 'status': None, 'bytes': 0, 'attempts': 0}
+    return await _get_with_retries(session, params, headers, semaphore or asyncio.Semaphore(1), retries,
+                                   api_endpoint, parse, result)
+
+
+async def download_all(file_names, period='all', store_dir='data', concurrency=8, retries=5, timeout=30,
+                       api_endpoint=API_ENDPOINT, api_key=API_KEY, incremental=False):
+    """
+    Download many files concurrently over one pooled keep-alive session.
+
+    :param file_names: Files on the API, e.g. ['WMT.csv', 'S81.csv']
+    :param period: 'day', 'week', 'fortnight' or 'all'
+    :param store_dir: Directory the files are written to (created if missing)
+    :param concurrency: Maximum number of requests in flight
+    :param retries: Maximum number of retries per file
+    :param timeout: Total timeout per request in seconds
+    :param api_endpoint: Full URL of the /csv resource
+    :param api_key: API key sent as x-api-key
+    :param incremental: Only fetch the rows after the last date of files already in the store
+    :return: List of result dicts in the order of file_names
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    since = {file_name: last_date(os.path.join(store_dir, file_name)) if incremental else None
+             for file_name in file_names}
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=60)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        tasks = [fetch_csv(session, file_name, period, store_dir, semaphore, retries, api_endpoint, api_key,
+                           since[file_name]) for file_name in file_names]
+        return await asyncio.gather(*tasks)
+
+
+async def load_records(file_names, period='all', concurrency=8, retries=5, timeout=30, api_endpoint=API_ENDPOINT,
+                       api_key=API_KEY):
+    """
+    Fetch many files concurrently straight into NumPy record arrays.
+
+    :return: Dict file name -> structured array with a 'date' field and one float field per column
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=60)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        results = await asyncio.gather(*[fetch_records(session, file_name, period, semaphore, retries, api_endpoint,
+                                                       api_key) for file_name in file_names])
+    failed = [f"{result['file']} ({result.get('error')})" for result in results if result['status'] != 200]
+    if failed:
+        raise RuntimeError(f"Failed to fetch: {', '.join(failed)}")
+    return {result['file']: result['records'] for result in results}
+
+
+def sync_all(file_names, period='all', store_dir='data', **kwargs):
+    """Blocking wrapper around download_all for scripts and notebooks without an event loop."""
+    return asyncio.run(download_all(file_names, period, store_dir, **kwargs))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download token CSVs and strategy signals concurrently")
+    parser.add_argument('files', nargs='*', help="Files to download (default: all 20 tickers)")
+    parser.add_argument('--period', default='all', help="'day', 'week', 'fortnight' or 'all' (default)")
+    parser.add_argument('--store', default='data', help="Directory to write the files to")
+    parser.add_argument('--concurrency', type=int, default=8, help="Maximum number of requests in flight")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only fetch rows after the last date of files already in the store")
+    args = parser.parse_args()
+
+    files = args.files or [f"{ticker}.csv" for ticker in TICKERS]
+    start = time.perf_counter()
+    results = sync_all(files, args.period, args.store, concurrency=args.concurrency, incremental=args.incremental)
+
+    for result in results:
+        if result['status'] == 200:
+            print(f"{result['file']}: {result['bytes']} bytes in {result['seconds']:.2f}s ({result['attempts']} attempts)")
+        else:
+            print(f"{result['file']}: failed with {result.get('error')} after {result['attempts']} attempts")
+    ok = sum(result['status'] == 200 for result in results)
+    print(f"\n{ok}/{len(results)} files in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,276 @@
+import asyncio
+import csv
+import io
+import json
+import os
+import time
+from collections import deque
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Seconds between two scans of the CSV folder for new or updated candles
+POLL_INTERVAL = float(os.environ.get("STREAM_POLL_INTERVAL", "5"))
+# Seconds of silence after which a comment line keeps proxies from closing the stream
+HEARTBEAT = 15.0
+
+
+def format_event(event_id, event, data):
+    """One server-sent event frame as bytes."""
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
+
+
+class CandleBroker:
+    """
+    Fan out candle updates to every subscriber of a ticker.
+
+    Each update is serialized to an SSE frame once in publish() and the same bytes object is put
+    on the queue of every subscriber, so the cost of an update does not grow with the JSON
+    encoding work per client. The last frame of every ticker is kept as a snapshot for new
+    subscribers and a ring buffer of recent frames lets a reconnecting client resume from its
+    Last-Event-ID without missing updates. A subscriber whose queue is full is disconnected
+    rather than slowing down the others; it resumes from its last event id on reconnect.
+
+    :param queue_size: Frames buffered per subscriber
+    :param replay: Number of recent frames kept for resuming clients
+    """
+
+    def __init__(self, queue_size=256, replay=4096):
+        self.queue_size = queue_size
+        self.latest = {}
+        self._replay = deque(maxlen=replay)
+        self._subscribers = {}
+        # Ids keep increasing across restarts, so an id from before a restart never resumes wrongly
+        self._seq = time.time_ns() // 1000
+
+    def publish(self, ticker, candle):
+        """
+        Send one new or updated candle to every subscriber of its ticker.
+
+        :param ticker: Ticker, e.g. 'SNEK'
+        :param candle: Dict with date, open, high, low, close and volume
+        :return: Number of subscribers the frame was queued for
+        """
+        self._seq += 1
+        frame = format_event(self._seq, 'candle', dict(candle, ticker=ticker))
+        self.latest[ticker] = (self._seq, frame)
+        self._replay.append((self._seq, ticker, frame))
+        sent = 0
+        for queue in list(self._subscribers.get(ticker, ())):
+            try:
+                queue.put_nowait(frame)
+                sent += 1
+            except asyncio.QueueFull:
+                self._disconnect(queue)
+        return sent
+
+    def subscribe(self, tickers, last_event_id=None):
+        """
+        Queue receiving the frames of the given tickers; None on the queue ends the stream.
+
+        The queue starts with the frames missed since last_event_id if they are still in the
+        replay buffer, and with the latest candle of every ticker otherwise.
+        """
+        queue = asyncio.Queue(self.queue_size)
+        queue.tickers = set(tickers)
+        try:
+            since = int(last_event_id)
+        except (TypeError, ValueError):
+            since = None
+        if since is not None and self._replay and self._replay[0][0] <= since + 1:
+            backlog = [frame for seq, ticker, frame in self._replay if seq > since and ticker in queue.tickers]
+        else:
+            backlog = [frame for _, frame in sorted(self.latest[ticker] for ticker in queue.tickers
+                                                    if ticker in self.latest)]
+        for frame in backlog[-self.queue_size:]:
+            queue.put_nowait(frame)
+        for ticker in queue.tickers:
+            self._subscribers.setdefault(ticker, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        for ticker in queue.tickers:
+            self._subscribers.get(ticker, set()).discard(queue)
+
+    def _disconnect(self, queue):
+        self.unsubscribe(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def subscriber_count(self):
+        return len({id(queue) for queues in self._subscribers.values() for queue in queues})
+
+
+def _parse_row(columns, row):
+    candle = {columns[0]: row[0].strip()}
+    for name, value in zip(columns[1:], row[1:]):
+        # Some exports quote numbers with thousands separators ("333,540")
+        value = value.replace(',', '').strip()
+        candle[name] = float(value) if value else None
+    return candle
+
+
+def read_tail(path, rows=2, since=None, block=8192):
+    """
+    Header-named dicts of the last rows of a CSV, reading only its end.
+
+    :param path: CSV file
+    :param rows: Number of rows returned when since is not given
+    :param since: Date; all rows from this date on are returned, however many were appended
+    :param block: Bytes read from the end at first, grown until the rows reach back to since
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.readline().decode('utf-8')
+        columns = [name.strip() for name in next(csv.reader([header]))]
+        start = f.tell()
+        while True:
+            f.seek(max(size - block, start))
+            at_start = f.tell() == start
+            lines = [line for line in f.read().decode('utf-8', errors='replace').splitlines() if line.strip()]
+            # The first line of the block may be cut off
+            if not at_start:
+                lines = lines[1:]
+            if since is None:
+                lines = lines[-rows:]
+            parsed = [_parse_row(columns, row) for row in csv.reader(io.StringIO('\n'.join(lines)))
+                      if len(row) == len(columns)]
+            if since is None:
+                return parsed
+            if at_start or (parsed and parsed[0][columns[0]] <= since):
+                return [candle for candle in parsed if candle[columns[0]] >= since]
+            block *= 4
+
+
+class CSVWatcher:
+    """
+    Publish new and updated candles of the token CSVs as they are written.
+
+    Every interval seconds the modification time and size of each CSV are checked; only changed
+    files are read, and only their rows from the last published date on, so every row appended
+    between two scans is published. A row with a later date than the last published candle is
+    new, a row with the same date and other values is an update of the current candle.
+
+    In run() the file system work (poll) happens in a worker thread, so a slow disk or a large
+    reload never stalls the event loop; publishing and on_change (apply) run on the loop, which
+    owns the broker queues and the data served by the routes.
+
+    :param broker: CandleBroker the candles are published to
+    :param data_dir: Folder with the token CSVs
+    :param interval: Seconds between scans
+    :param load: Called in the worker thread with the ticker of a changed file, e.g. TimeSeriesStore.read
+    :param on_change: Called on the event loop with the ticker and the result of load, e.g. TimeSeriesStore.install
+    """
+
+    def __init__(self, broker, data_dir, interval=POLL_INTERVAL, load=None, on_change=None):
+        self.broker = broker
+        self.data_dir = data_dir
+        self.interval = interval
+        self.load = load
+        self.on_change = on_change
+        self._stats = {}
+        self._last = {}
+
+    def poll(self):
+        """
+        Check every CSV once without publishing anything; safe to run in a worker thread.
+
+        :return: List of (ticker, result of load or None, new or updated candles) per changed file
+        """
+        changes = []
+        for name in sorted(os.listdir(self.data_dir)):
+            path = os.path.join(self.data_dir, name)
+            if not name.endswith('.csv') or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if self._stats.get(name) == signature:
+                continue
+            ticker = name[:-4]
+            first_scan = name not in self._stats
+            self._stats[name] = signature
+            last = self._last.get(ticker)
+            try:
+                rows = read_tail(path, since=last['date'] if last is not None else None)
+                loaded = self.load(ticker) if not first_scan and self.load is not None else None
+            except (OSError, UnicodeDecodeError, StopIteration, ValueError):
+                continue
+            candles = []
+            for candle in rows[-1:] if first_scan else rows:
+                if last is None or candle['date'] > last['date'] or (candle['date'] == last['date'] and candle != last):
+                    candles.append(candle)
+                    last = candle
+            self._last[ticker] = last
+            changes.append((ticker, loaded, candles))
+        return changes
+
+    def apply(self, changes):
+        """Pass the changes of poll to on_change and publish their candles; returns the number published."""
+        published = 0
+        for ticker, loaded, candles in changes:
+            if loaded is not None and self.on_change is not None:
+                self.on_change(ticker, loaded)
+            for candle in candles:
+                self.broker.publish(ticker, candle)
+                published += 1
+        return published
+
+    def scan(self):
+        """Check every CSV once in the calling thread; returns the number of candles published."""
+        return self.apply(self.poll())
+
+    async def run(self):
+        while True:
+            changes = await asyncio.to_thread(self.poll)
+            # Back on the event loop: the broker queues are not thread-safe
+            self.apply(changes)
+            await asyncio.sleep(self.interval)
+
+
+# Shared by the /stream route and the watcher started by asgi_app.py
+broker = CandleBroker()
+router = APIRouter()
+
+
+async def _events(request, queue):
+    # Reconnect after 3 seconds if the connection drops
+    yield b"retry: 3000\n\n"
+    try:
+        while True:
+            try:
+                frame = await asyncio.wait_for(queue.get(), HEARTBEAT)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield b": keep-alive\n\n"
+                continue
+            if frame is None:
+                return
+            yield frame
+    finally:
+        broker.unsubscribe(queue)
+
+
+@router.get('/stream', summary='Live candle updates (server-sent events)',
+            responses={200: {'content': {'text/event-stream': {'example': 'id: 1724164391000001\nevent: candle\n'
+                             'data: {"date": "2025-08-20", "open": 0.2063, "high": 0.2063, "low": 0.2049, '
+                             '"close": 0.2059, "volume": 3387.83, "ticker": "WMT"}\n\n'}}},
+                       404: {'description': 'Unknown ticker'}})
+async def stream(request: Request,
+                 tickers: str = Query(..., description='Comma separated tickers, e.g. WMT,SNEK')):
+    """
+    Push every new or updated candle of the subscribed tickers as it is written.
+
+    The stream starts with the latest candle of each ticker. Reconnecting clients send
+    Last-Event-ID and receive the updates they missed.
+    """
+    names = [ticker.strip() for ticker in tickers.split(',') if ticker.strip()]
+    unknown = [ticker for ticker in names if ticker not in broker.latest]
+    if unknown:
+        return JSONResponse({'error': f"Unknown ticker: {', '.join(unknown)}", 'tickers': sorted(broker.latest)},
+                            status_code=404)
+    queue = broker.subscribe(names, request.headers.get('last-event-id'))
+    # Content-Encoding keeps the GZip middleware from buffering the stream
+    headers = {'Cache-Control': 'no-cache', 'Content-Encoding': 'identity', 'X-Accel-Buffering': 'no'}
+    return StreamingResponse(_events(request, queue), media_type='text/event-stream', headers=headers)
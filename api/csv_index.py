@@ -0,0 +1,152 @@
+import json
+from bisect import bisect_right
+from datetime import datetime, timezone
+
+# Number of trading days returned per period; None returns the whole file
+PERIODS = {'day': 1, 'week': 7, 'fortnight': 14, 'all': None}
+
+# Indexes checked against the object ETag, reused across warm invocations
+_INDEXES = {}
+
+
+def build_index(body, etag):
+    """
+    Byte offset of every row of a CSV, by date.
+
+    :param body: CSV content as bytes; the first column is the date
+    :param etag: ETag of the object the index describes
+    :return: Dict with the header, the row dates and their byte offsets and the object size
+    """
+    header_end = body.index(b'\n') + 1
+    dates, offsets = [], []
+    position = header_end
+    while position < len(body):
+        end = body.find(b'\n', position)
+        end = len(body) if end < 0 else end + 1
+        line = body[position:end]
+        if line.strip():
+            dates.append(line.split(b',', 1)[0].decode('utf-8'))
+            offsets.append(position)
+        position = end
+    return {'etag': etag, 'header': body[:header_end].decode('utf-8'), 'dates': dates, 'offsets': offsets,
+            'size': len(body)}
+
+
+def slice_period(text, period):
+    """Header line plus the last rows of a CSV for the given period."""
+    rows = PERIODS[period]
+    if rows is None:
+        return text
+    lines = text.rstrip('\n').split('\n')
+    return '\n'.join([lines[0]] + lines[1:][-rows:]) + '\n'
+
+
+def sidecar_name(key):
+    return f"{key}.json"
+
+
+def slices_name(key):
+    return f"{key}.periods.json"
+
+
+def publish_index(store, key, obj=None):
+    """Build the index of one object and store it as a sidecar next to it."""
+    obj = obj or store.get(key)
+    index = build_index(obj['body'], obj['etag'])
+    store.put_sidecar(sidecar_name(key), json.dumps(index).encode('utf-8'))
+    return index
+
+
+def publish_slices(store, key, obj=None):
+    """
+    Precompute the period slices (day, week, fortnight) of one object and store them as a sidecar.
+
+    The API then answers period requests from this small file instead of downloading and
+    splitting the whole CSV on every request.
+    """
+    obj = obj or store.get(key)
+    text = obj['body'].decode('utf-8')
+    slices = {'etag': obj['etag'],
+              'periods': {period: slice_period(text, period) for period, rows in PERIODS.items() if rows}}
+    store.put_sidecar(slices_name(key), json.dumps(slices).encode('utf-8'))
+    return slices
+
+
+def load_slice(store, key, etag, period):
+    """CSV text of a precomputed period slice, or None if there is none for this version of the object."""
+    try:
+        slices = json.loads(store.get_sidecar(slices_name(key)))
+    except KeyError:
+        return None
+    if slices['etag'] != etag:
+        return None
+    return slices['periods'].get(period)
+
+
+def load_index(store, key, etag):
+    """
+    Index of an object at the given ETag: from memory, from the sidecar, or built from the body.
+
+    A sidecar written for an older version of the object is ignored, so a stale index can
+    never return wrong rows; the object is then scanned once and the index kept in memory.
+    """
+    index = _INDEXES.get(key)
+    if index is not None and index['etag'] == etag:
+        return index
+    try:
+        index = json.loads(store.get_sidecar(sidecar_name(key)))
+    except KeyError:
+        index = None
+    if index is None or index['etag'] != etag:
+        obj = store.get(key)
+        index = build_index(obj['body'], obj['etag'])
+    _INDEXES[key] = index
+    return index
+
+
+def parse_since(since, sample_date):
+    """
+    Normalize a since value to the format of the CSV dates, so dates compare as strings.
+
+    :param since: ISO date or date-time ('2024-05-01', '2024-05-01 12:00:00') or Unix epoch seconds
+    :param sample_date: One date of the CSV, e.g. '2024-05-01'
+    :return: String comparable with the CSV dates
+    """
+    since = str(since).strip()
+    if since.replace('.', '', 1).isdigit():
+        moment = datetime.fromtimestamp(float(since), tz=timezone.utc).replace(tzinfo=None)
+    else:
+        moment = datetime.fromisoformat(since.replace('Z', ''))
+    if len(sample_date) <= 10:
+        return moment.date().isoformat()
+    return moment.isoformat(sep=sample_date[10])[:len(sample_date)]
+
+
+def rows_since(store, key, etag, since):
+    """
+    CSV text with the header and only the rows dated after since.
+
+    The index gives the byte offset of the first missing row and the object is read from there
+    with a ranged read, so the rows before it are never transferred.
+    """
+    index = load_index(store, key, etag)
+    if not index['dates']:
+        return index['header']
+    position = bisect_right(index['dates'], parse_since(since, index['dates'][0]))
+    if position == len(index['offsets']):
+        return index['header']
+    return index['header'] + store.get_range(key, index['offsets'][position]).decode('utf-8')
+
+
+if __name__ == "__main__":
+    import sys
+
+    from object_store import LocalObjectStore, S3ObjectStore
+
+    # Build the sidecar indexes and period slices after each daily upload: python3 csv_index.py [directory]
+    store = LocalObjectStore(sys.argv[1]) if len(sys.argv) > 1 else S3ObjectStore()
+    for key in store.list_keys():
+        obj = store.get(key)
+        index = publish_index(store, key, obj)
+        publish_slices(store, key, obj)
+        print(f"{key}: {len(index['dates'])} rows indexed, period slices published")
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Default cache location next to this script
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.api_cache')
+
+# Seconds a cached response is used without asking the server again, per period.
+# Other periods are always revalidated, which costs a request but no body if nothing changed.
+DEFAULT_TTL = {'day': 300}
+
+# Request headers that identify the caller; responses are cached per value, so one key never sees another's data
+AUTH_HEADERS = ('x-api-key', 'authorization')
+
+
+class CachedResponse:
+    """The parts of a requests.Response the client scripts use, for fresh and cached answers alike."""
+
+    def __init__(self, status_code, headers, content, url, from_cache=False):
+        self.status_code = status_code
+        # Case-insensitive like requests, servers may send 'etag' as well as 'ETag'
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.url = url
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class HttpCache:
+    """
+    Local HTTP cache with conditional requests.
+
+    Each 200 response is stored with its ETag and Last-Modified validators. The next request for
+    the same URL and parameters sends If-None-Match / If-Modified-Since, and a 304 Not Modified
+    answer is served from the cache. Within the TTL of a period the server is not asked at all.
+    Entries are kept per API key (x-api-key or Authorization header), so a fresh entry is never
+    served to a request with another or no key; a revoked key is refused once the TTL runs out.
+
+    :param cache_dir: Directory for the cached bodies and validators
+    :param ttl: Dict period -> seconds of freshness (default: 5 minutes for 'day')
+    :param session: requests.Session to reuse connections (default: a new session)
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=None, session=None):
+        self.cache_dir = cache_dir
+        self.ttl = DEFAULT_TTL if ttl is None else ttl
+        self.session = session or requests.Session()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url, params, headers=None):
+        auth = sorted((name.lower(), value) for name, value in (headers or {}).items() if name.lower() in AUTH_HEADERS)
+        key = hashlib.sha1(json.dumps([url, sorted((params or {}).items()), auth]).encode()).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.json", f"{base}.body"
+
+    def _load(self, url, params, headers=None):
+        meta_path, body_path = self._paths(url, params, headers)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def _save(self, url, params, headers, meta, body=None):
+        meta_path, body_path = self._paths(url, params, headers)
+        if body is not None:
+            with open(f"{body_path}.tmp", 'wb') as f:
+                f.write(body)
+            os.replace(f"{body_path}.tmp", body_path)
+        with open(f"{meta_path}.tmp", 'w') as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    def get(self, url, params=None, headers=None, timeout=10):
+        """
+        GET with the cache; raises requests exceptions like requests.get.
+
+        :return: CachedResponse; from_cache is True if the body came from the cache
+        """
+        meta, body = self._load(url, params, headers)
+        ttl = self.ttl.get((params or {}).get('period', 'all'))
+        if meta is not None and ttl is not None and time.time() - meta['fetched_at'] < ttl:
+            return CachedResponse(200, meta['headers'], body, meta['url'], from_cache=True)
+
+        request_headers = dict(headers or {})
+        cached_headers = CaseInsensitiveDict(meta['headers']) if meta is not None else None
+        if meta is not None:
+            if cached_headers.get('ETag'):
+                request_headers['If-None-Match'] = cached_headers['ETag']
+            if cached_headers.get('Last-Modified'):
+                request_headers['If-Modified-Since'] = cached_headers['Last-Modified']
+
+        response = self.session.get(url, params=params, headers=request_headers, timeout=timeout)
+        if response.status_code == 304 and meta is not None:
+            for name in ('ETag', 'Last-Modified'):
+                if name in response.headers:
+                    cached_headers[name] = response.headers[name]
+            meta['fetched_at'] = time.time()
+            meta['headers'] = dict(cached_headers)
+            self._save(url, params, headers, meta)
+            return CachedResponse(200, meta['headers'], body, response.url, from_cache=True)
+
+        if response.status_code == 200 and ('ETag' in response.headers or 'Last-Modified' in response.headers
+                                            or ttl is not None):
+            self._save(url, params, headers, {'url': response.url, 'fetched_at': time.time(),
+                                              'headers': dict(response.headers)}, response.content)
+        return CachedResponse(response.status_code, dict(response.headers), response.content, response.url)
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            os.remove(os.path.join(self.cache_dir, name))
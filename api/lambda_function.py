@@ -0,0 +1,275 @@
+import base64
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import format_datetime, parsedate_to_datetime
+
+from csv_index import PERIODS, load_slice, rows_since, slice_period
+from metrics import InstrumentedStore, record_request, track_cache
+from object_store import S3ObjectStore
+from transport import encode, negotiate
+
+# Seconds a client may reuse a response without asking again (the data changes once a day)
+CACHE_MAX_AGE = int(os.environ.get("CACHE_MAX_AGE", "300"))
+
+# Seconds a serialized response is served from memory before the S3 ETag is checked again
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "60"))
+# Maximum number of serialized responses kept in memory
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "512"))
+
+_STORE = None
+_RESPONSES = None
+
+
+def _response(status, body=None, headers=None):
+    response = {'statusCode': status, 'headers': headers or {}}
+    response['body'] = json.dumps(body) if body is not None else ''
+    if body is not None:
+        response['headers']['Content-Type'] = 'application/json'
+    return response
+
+
+def _encoded_response(data, fmt, compress, headers):
+    # API Gateway needs binary bodies (NumPy records, gzip) base64 encoded
+    body, content_headers = encode(data, fmt, compress)
+    headers.update(content_headers)
+    if fmt == 'npy' or 'Content-Encoding' in content_headers:
+        return {'statusCode': 200, 'headers': headers, 'body': base64.b64encode(body).decode('ascii'),
+                'isBase64Encoded': True}
+    return {'statusCode': 200, 'headers': headers, 'body': body.decode('utf-8')}
+
+
+def _header(headers, name):
+    # API Gateway passes headers with the case the client sent
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+class ResponseCache:
+    """
+    Serialized responses by (file, variant), kept in memory across warm invocations.
+
+    An entry is served without touching S3 for ttl seconds. After that the object is checked
+    with a HEAD request: if its ETag is unchanged the entry is renewed, otherwise it is rebuilt.
+    A new upload is therefore visible after at most ttl seconds. All methods are thread-safe,
+    so one cache can serve the threads of local_server.py.
+
+    :param ttl: Seconds an entry is served before its ETag is checked again
+    :param max_entries: Maximum number of entries, least recently used ones are dropped first
+    """
+
+    def __init__(self, ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Entry dict (meta, response, checked) or None."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def fresh(self, entry):
+        return time.monotonic() - entry['checked'] < self.ttl
+
+    def renew(self, entry):
+        entry['checked'] = time.monotonic()
+
+    def hit(self):
+        """Count a response served from the cache."""
+        with self._lock:
+            self.hits += 1
+
+    def put(self, key, meta, response):
+        """Store a freshly built response and count the miss."""
+        with self._lock:
+            self.misses += 1
+            self.entries[key] = {'meta': meta, 'response': response, 'checked': time.monotonic()}
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+def _copy(response, cache_status):
+    # Cached responses are shared, every caller gets its own headers
+    headers = dict(response['headers'])
+    headers['X-Cache'] = cache_status
+    return dict(response, headers=headers)
+
+
+def validators(meta, variant):
+    """
+    ETag and Last-Modified of a response.
+
+    The ETag is the S3 object ETag extended by the variant (period or since value, format and
+    encoding), since every slice and encoding of the same object is a different representation.
+    """
+    return {
+        'ETag': f'"{meta["etag"].strip(chr(34))}-{variant}"',
+        'Last-Modified': format_datetime(meta['last_modified'].replace(microsecond=0), usegmt=True),
+    }
+
+
+def not_modified(headers, response_headers, last_modified):
+    """True if the request validators match the current object (If-None-Match takes precedence)."""
+    if_none_match = _header(headers, 'if-none-match')
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or response_headers['ETag'] in tags or f"W/{response_headers['ETag']}" in tags
+    if_modified_since = _header(headers, 'if-modified-since')
+    if if_modified_since is not None:
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def handle_request(params, headers, store, cache=None):
+    """
+    Answer one /csv request.
+
+    :param params: Query parameters, 'file' and optional 'period' or 'since' (date or epoch seconds;
+        returns only the rows dated after it and takes precedence over period) and 'format'
+        ('json', 'csv', 'npy', optionally with '.gz'; default from the Accept header)
+    :param headers: Request headers
+    :param store: S3ObjectStore or LocalObjectStore
+    :param cache: ResponseCache reused across requests (default: build every response)
+    :return: API Gateway proxy response dict (statusCode, headers, body)
+    """
+    params = params or {}
+    file_name = params.get('file')
+    period = params.get('period', 'all')
+    since = params.get('since')
+    if not file_name:
+        return _response(400, {'error': "Missing 'file' parameter"})
+    if period not in PERIODS:
+        return _response(400, {'error': f"Unknown period '{period}'", 'periods': list(PERIODS)})
+    try:
+        fmt, compress = negotiate(params, _header(headers, 'accept'), _header(headers, 'accept-encoding'))
+    except ValueError:
+        return _response(400, {'error': f"Unknown format '{params.get('format')}'", 'formats': ['json', 'csv', 'npy']})
+    # Label of the representation for the ETag; the legacy JSON response keeps its plain period label
+    variant = period if since is None else f"since-{since}"
+    if fmt != 'json':
+        variant += f"-{fmt}"
+    if compress:
+        variant += "-gzip"
+
+    key = (file_name, variant)
+    entry = cache.get(key) if cache is not None else None
+    if entry is not None and cache.fresh(entry):
+        meta = entry['meta']
+    else:
+        try:
+            meta = store.head(file_name)
+        except KeyError:
+            return _response(404, {'error': f"File '{file_name}' not found", 'available_files': store.list_keys()})
+        if entry is not None:
+            if entry['meta']['etag'] == meta['etag']:
+                cache.renew(entry)
+            else:
+                entry = None
+
+    response_headers = validators(meta, variant)
+    response_headers['Cache-Control'] = f'max-age={CACHE_MAX_AGE}'
+    if not_modified(headers, response_headers, meta['last_modified']):
+        return _response(304, headers=response_headers)
+
+    if entry is not None:
+        cache.hit()
+        return _copy(entry['response'], 'Hit')
+
+    if since is not None:
+        try:
+            data = rows_since(store, file_name, meta['etag'], since)
+        except ValueError:
+            return _response(400, {'error': f"Invalid since '{since}', use a date like 2024-05-01 or epoch seconds"})
+    else:
+        # Period slices precomputed at publish time (csv_index.py), the whole object otherwise
+        data = load_slice(store, file_name, meta['etag'], period) if PERIODS[period] else None
+        if data is None:
+            obj = store.get(file_name)
+            # The object may have changed between HEAD and GET; describe the body actually sent
+            meta = obj
+            response_headers.update(validators(obj, variant))
+            data = slice_period(obj['body'].decode('utf-8'), period)
+    response = _encoded_response(data, fmt, compress, response_headers)
+    if cache is None:
+        return response
+    cache.put(key, {'etag': meta['etag'], 'last_modified': meta['last_modified']}, response)
+    return _copy(response, 'Miss')
+
+
+def _body_size(response):
+    # Bytes of the body as sent by API Gateway, i.e. after base64 decoding
+    body = response.get('body') or ''
+    if response.get('isBase64Encoded'):
+        return len(body) * 3 // 4 - body[-2:].count('=')
+    return len(body)
+
+
+def lambda_handler(event, context):
+    global _STORE, _RESPONSES
+    if _STORE is None:
+        # Created once per container and reused across warm invocations
+        _STORE = InstrumentedStore(S3ObjectStore())
+        _RESPONSES = ResponseCache()
+        track_cache('lambda', 'responses', _RESPONSES)
+    start = time.perf_counter()
+    params = event.get('queryStringParameters') or {}
+    try:
+        response = handle_request(params, event.get('headers'), _STORE, _RESPONSES)
+    except Exception as e:
+        response = _response(500, {'error': str(e)})
+    # One JSON line per request in CloudWatch Logs
+    record_request('lambda', '/csv', response['statusCode'], time.perf_counter() - start, _body_size(response),
+                   _header(event.get('headers'), 'x-api-key'), cache=response['headers'].get('X-Cache'),
+                   file=params.get('file'), request_id=getattr(context, 'aws_request_id', None))
+    return response
+
+
+if __name__ == "__main__":
+    import statistics
+    import sys
+
+    from object_store import LocalObjectStore
+
+    class CountingStore:
+        # Counts the reads a request makes, S3 bills GET and HEAD requests separately
+        def __init__(self, store):
+            self.store = store
+            self.calls = {}
+
+        def __getattr__(self, name):
+            method = getattr(self.store, name)
+
+            def counted(*args, **kwargs):
+                self.calls[name] = self.calls.get(name, 0) + 1
+                return method(*args, **kwargs)
+            return counted
+
+    # Replay requests against the token CSVs: python3 lambda_function.py [directory]
+    root = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                                                              'tokens')
+    requests = [{'file': key, 'period': period} for key in LocalObjectStore(root).list_keys() for period in PERIODS]
+    for label, cache in [("No cache", None), ("Response cache", ResponseCache())]:
+        store = CountingStore(LocalObjectStore(root))
+        timings = []
+        for _ in range(20):
+            for params in requests:
+                start = time.perf_counter()
+                handle_request(params, {}, store, cache)
+                timings.append(time.perf_counter() - start)
+        reads = ', '.join(f"{name} {count}" for name, count in sorted(store.calls.items()))
+        print(f"{label}: p50 {statistics.median(timings) * 1e3:.3f} ms, "
+              f"p99 {statistics.quantiles(timings, n=100)[98] * 1e3:.3f} ms, {len(timings)} requests, reads: {reads}")
@@ -0,0 +1,164 @@
+import argparse
+import asyncio
+import itertools
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+import numpy as np
+import requests
+
+from async_client import API_KEY, TICKERS
+
+# Query parameters cycled through by default: every ticker with every period
+DEFAULT_PARAMS = [{'file': f"{ticker}.csv", 'period': period}
+                  for ticker in TICKERS for period in ('day', 'week', 'fortnight', 'all')]
+
+
+def summarize(samples, elapsed):
+    """
+    Throughput, latency percentiles and error rate of a run.
+
+    :param samples: List of (status or None on a connection error, seconds, bytes) per request
+    :param elapsed: Wall clock seconds of the whole run
+    :return: Dict with requests, throughput, p50/p95/p99/max latency in ms, error rate and MB received
+    """
+    latencies = np.array([seconds for _, seconds, _ in samples]) * 1e3
+    errors = sum(status is None or status >= 400 for status, _, _ in samples)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (np.nan,) * 3
+    return {
+        'requests': len(samples),
+        'throughput': len(samples) / elapsed if elapsed else np.nan,
+        'p50 ms': p50,
+        'p95 ms': p95,
+        'p99 ms': p99,
+        'max ms': latencies.max() if len(latencies) else np.nan,
+        'error rate': errors / len(samples) if samples else np.nan,
+        'MB': sum(size for _, _, size in samples) / 1e6,
+    }
+
+
+def run_sync(api_endpoint, params_list, total=1000, concurrency=8, headers=None):
+    """
+    Load the API with blocking requests clients, one keep-alive Session per worker thread.
+
+    :param api_endpoint: Full URL of the /csv resource
+    :param params_list: Query parameters, cycled through until total requests are sent
+    :param total: Number of requests
+    :param concurrency: Number of worker threads
+    :param headers: Request headers, e.g. the x-api-key
+    :return: Summary dict, see summarize
+    """
+    local = threading.local()
+
+    def one(params):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = local.session.get(api_endpoint, params=params, headers=headers, timeout=30)
+            return response.status_code, time.perf_counter() - start, len(response.content)
+        except requests.RequestException:
+            return None, time.perf_counter() - start, 0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, itertools.islice(itertools.cycle(params_list), total)))
+    return summarize(samples, time.perf_counter() - start)
+
+
+async def run_async(api_endpoint, params_list, total=1000, concurrency=8, headers=None):
+    """Load the API with one pooled aiohttp session and at most concurrency requests in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async def one(session, params):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                async with session.get(api_endpoint, params=params, headers=headers) as response:
+                    content = await response.read()
+                    return response.status, time.perf_counter() - start, len(content)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                return None, time.perf_counter() - start, 0
+
+    start = time.perf_counter()
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30)) as session:
+        samples = await asyncio.gather(*[one(session, params)
+                                         for params in itertools.islice(itertools.cycle(params_list), total)])
+    return summarize(samples, time.perf_counter() - start)
+
+
+def start_local_server(*options):
+    """
+    Run local_server.py in a separate process, so it does not share the GIL with the load generator.
+
+    :param options: Extra command line options, e.g. '--no-cache'
+    :return: (subprocess.Popen, base URL ending with /prod); terminate() the process when done
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'local_server.py')
+    process = subprocess.Popen([sys.executable, script, '--port', '0', '--quiet', *options],
+                               stdout=subprocess.PIPE, text=True)
+    # The server prints its URL once it is listening
+    for line in process.stdout:
+        if line.startswith('export DATAPORTAL_BASE_URL='):
+            return process, line.strip().split('=', 1)[1]
+    raise RuntimeError("local_server.py exited before it started listening")
+
+
+def cache_hit_ratio(base_url):
+    """Hit ratio of the response cache from the /metrics route of a local server, None if unavailable."""
+    root = base_url.rstrip('/')
+    root = root[:-len('/prod')] if root.endswith('/prod') else root
+    try:
+        text = requests.get(root + '/metrics', timeout=10).text
+    except requests.RequestException:
+        return None
+    counts = {}
+    for line in text.splitlines():
+        if line.startswith('dataportal_cache_requests_total{'):
+            result = line.split('result="', 1)[1].split('"', 1)[0]
+            counts[result] = counts.get(result, 0) + float(line.rsplit(' ', 1)[1])
+    total = counts.get('hit', 0) + counts.get('miss', 0)
+    return counts.get('hit', 0) / total if total else None
+
+
+def report(label, summary):
+    print(f"{label}: {summary['requests']} requests, {summary['throughput']:.0f} req/s, "
+          f"p50 {summary['p50 ms']:.2f} ms, p95 {summary['p95 ms']:.2f} ms, p99 {summary['p99 ms']:.2f} ms, "
+          f"max {summary['max ms']:.2f} ms, errors {summary['error rate']:.1%}, {summary['MB']:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the /csv API with sync and async clients")
+    parser.add_argument('--url', help="Base URL ending with /prod (default: run local_server.py in a subprocess)")
+    parser.add_argument('--requests', type=int, default=2000, help="Requests per client")
+    parser.add_argument('--concurrency', type=int, default=16, help="Requests in flight")
+    parser.add_argument('--client', choices=['sync', 'async', 'both'], default='both')
+    parser.add_argument('--format', help="format= parameter, e.g. csv, npy or csv.gz (default: legacy JSON)")
+    parser.add_argument('--api-key', default=API_KEY)
+    parser.add_argument('--no-cache', action='store_true', help="Disable the response cache of the local server")
+    args = parser.parse_args()
+
+    server = None
+    if args.url is None:
+        server, args.url = start_local_server(*(['--no-cache'] if args.no_cache else []))
+        print(f"Local server on {args.url}")
+    api_endpoint = args.url + "/csv"
+    params_list = [dict(params, format=args.format) if args.format else params for params in DEFAULT_PARAMS]
+    headers = {'x-api-key': args.api_key}
+
+    if args.client in ('sync', 'both'):
+        report("sync (requests)", run_sync(api_endpoint, params_list, args.requests, args.concurrency, headers))
+    if args.client in ('async', 'both'):
+        report("async (aiohttp)", asyncio.run(run_async(api_endpoint, params_list, args.requests, args.concurrency,
+                                                        headers)))
+    ratio = cache_hit_ratio(args.url)
+    if ratio is not None:
+        print(f"Server response cache hit ratio: {ratio:.1%}")
+    if server is not None:
+        server.terminate()
@@ -0,0 +1,128 @@
+import argparse
+import base64
+import json
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import metrics
+from lambda_function import ResponseCache, handle_request
+from object_store import LocalObjectStore
+
+# Token CSVs of the repository, next to this folder
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tokens')
+
+# Accepted API keys, comma separated; the default is the placeholder key of the client scripts
+API_KEYS = set(os.environ.get("DATAPORTAL_API_KEYS", "your_api_key_here").split(','))
+
+# The API Gateway stage serves /prod/csv, plain /csv is accepted as well
+PATHS = {'/csv', '/prod/csv'}
+
+
+class LocalAPIHandler(BaseHTTPRequestHandler):
+    """
+    Serve the /csv resource of the Dataportal API from local files.
+
+    Requests go through the same handle_request as the Lambda, so status codes, headers,
+    formats and conditional requests behave like the deployed API. Like API Gateway, a missing
+    or unknown x-api-key is answered with 403 and base64 bodies are decoded before sending.
+    """
+
+    # Keep-alive, so pooled clients reuse their connections as they do against API Gateway
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without this Nagle's algorithm delays every response by ~40 ms
+    disable_nagle_algorithm = True
+    store = None
+    cache = None
+    api_keys = API_KEYS
+
+    def _send(self, status, headers, body):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self, url):
+        # (endpoint label, status, headers, body bytes) of one request
+        path = url.path.rstrip('/')
+        if path == '/metrics':
+            return '/metrics', 200, {'Content-Type': metrics.CONTENT_TYPE}, metrics.REGISTRY.render().encode('utf-8')
+        if path not in PATHS:
+            return 'unmatched', 404, {'Content-Type': 'application/json'}, b'{"message": "Not Found"}'
+        if self.api_keys and self.headers.get('x-api-key') not in self.api_keys:
+            return '/csv', 403, {'Content-Type': 'application/json'}, b'{"message": "Forbidden"}'
+
+        try:
+            response = handle_request(dict(parse_qsl(url.query)), dict(self.headers), self.store, self.cache)
+        except Exception as e:
+            response = {'statusCode': 500, 'headers': {'Content-Type': 'application/json'},
+                        'body': json.dumps({'error': str(e)})}
+        body = response.get('body') or ''
+        body = base64.b64decode(body) if response.get('isBase64Encoded') else body.encode('utf-8')
+        return '/csv', response['statusCode'], response['headers'], body
+
+    def do_GET(self):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        endpoint, status, headers, body = self._dispatch(url)
+        self._send(status, headers, body)
+        metrics.record_request('local', endpoint, status, time.perf_counter() - start, len(body),
+                               self.headers.get('x-api-key'), cache=headers.get('X-Cache'))
+
+    def log_request(self, code='-', size='-'):
+        # Replaced by the JSON line of metrics.record_request; errors are still logged
+        pass
+
+
+class LocalAPIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections when a load test opens many at once
+    request_queue_size = 128
+
+
+def make_server(data_dir=DATA_DIR, host='127.0.0.1', port=8000, api_keys=API_KEYS, cache=True, quiet=False):
+    """
+    Create (but do not start) a local API server.
+
+    :param data_dir: Directory with the CSVs to serve
+    :param host: Interface to bind to
+    :param port: Port to listen on (0 picks a free one, see server.server_port)
+    :param api_keys: Accepted x-api-key values; empty to accept every request
+    :param cache: Keep serialized responses in memory like a warm Lambda
+    :param quiet: Do not write the JSON log line of every request
+    :return: LocalAPIServer (a ThreadingHTTPServer); call serve_forever() to start it
+    """
+    handler = type('Handler', (LocalAPIHandler,), {
+        'store': metrics.InstrumentedStore(LocalObjectStore(data_dir)),
+        'cache': ResponseCache() if cache else None,
+        'api_keys': set(api_keys or ()),
+    })
+    if handler.cache is not None:
+        metrics.track_cache('local', 'responses', handler.cache)
+    if quiet:
+        metrics.LOGGER.disabled = True
+    return LocalAPIServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the token CSVs with the /csv contract of the Dataportal API")
+    parser.add_argument('--data', default=DATA_DIR, help="Directory with the CSVs (default: ../tokens)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000, help="Port to listen on (0 picks a free one)")
+    parser.add_argument('--no-cache', action='store_true', help="Build every response from the files")
+    parser.add_argument('--no-auth', action='store_true', help="Accept requests without a valid x-api-key")
+    parser.add_argument('--quiet', action='store_true', help="Do not log every request")
+    args = parser.parse_args()
+
+    server = make_server(args.data, args.host, args.port, set() if args.no_auth else API_KEYS,
+                         cache=not args.no_cache, quiet=args.quiet)
+    print(f"Serving {args.data} on http://{args.host}:{server.server_port}/prod/csv, "
+          f"metrics on http://{args.host}:{server.server_port}/metrics")
+    print(f"export DATAPORTAL_BASE_URL=http://{args.host}:{server.server_port}/prod", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,261 @@
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency buckets in seconds, from cached in-memory answers to slow S3 reads
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labels, key)), value
+
+
+class Histogram:
+    """Histogram with labels; observations are counted per bucket and summed."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        # Values above the last bucket only show up in +Inf (the count)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self._values.items())
+        for key, (counts, total, count) in items:
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", dict(labels, le=_format_value(bound)), cumulative
+            yield f"{self.name}_bucket", dict(labels, le='+Inf'), count
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class CacheCounter:
+    """
+    Hit and miss counts read from cache objects when the metrics are rendered.
+
+    Any object with hits and misses attributes can be tracked (ResponseCache of the Lambda,
+    TimeSeriesStore), so the caches do not need to know about metrics.
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._caches = {}
+
+    def track(self, app, cache_name, cache):
+        self._caches[(app, cache_name)] = cache
+
+    def samples(self):
+        for (app, cache_name), cache in sorted(self._caches.items(), key=lambda item: item[0]):
+            yield self.name, {'app': app, 'cache': cache_name, 'result': 'hit'}, cache.hits
+            yield self.name, {'app': app, 'cache': cache_name, 'result': 'miss'}, cache.misses
+
+
+class Registry:
+    """Metrics of this process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    'dataportal_requests_total', 'Requests by app, endpoint and status code.', ('app', 'endpoint', 'status')))
+LATENCY = REGISTRY.register(Histogram(
+    'dataportal_request_duration_seconds', 'Time until the response headers were sent.', ('app', 'endpoint')))
+RESPONSE_BYTES = REGISTRY.register(Counter(
+    'dataportal_response_bytes_total', 'Response body bytes sent, after compression.', ('app', 'endpoint')))
+API_KEY_REQUESTS = REGISTRY.register(Counter(
+    'dataportal_api_key_requests_total', 'Requests per API key (first 12 hex digits of its SHA-256).',
+    ('app', 'key')))
+CACHE_REQUESTS = REGISTRY.register(CacheCounter(
+    'dataportal_cache_requests_total', 'Lookups of the in-memory response caches.'))
+STORE_FETCH = REGISTRY.register(Histogram(
+    'dataportal_store_fetch_seconds', 'Duration of object store (S3) calls.', ('operation',)))
+
+# One JSON object per request; DATAPORTAL_ACCESS_LOG=0 switches them off
+LOGGER = logging.getLogger('dataportal.access')
+LOGGER.setLevel(logging.INFO)
+LOGGER.disabled = os.environ.get("DATAPORTAL_ACCESS_LOG", "1") == "0"
+if not logging.getLogger().handlers:
+    # Nothing configured logging (unlike the Lambda runtime): write plain JSON lines to stderr
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    LOGGER.addHandler(_handler)
+    LOGGER.propagate = False
+
+
+def key_id(api_key):
+    """Label of an API key that identifies it without exposing it."""
+    if not api_key:
+        return 'anonymous'
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12]
+
+
+def track_cache(app, cache_name, cache):
+    """Export the hits and misses attributes of a cache object."""
+    CACHE_REQUESTS.track(app, cache_name, cache)
+
+
+def record_request(app, endpoint, status, seconds, size=0, api_key=None, **fields):
+    """
+    Count one request in the metrics and write it as one JSON log line.
+
+    :param app: 'lambda', 'local', 'flask' or 'asgi'
+    :param endpoint: Route template, e.g. '/data/{ticker}', never the raw path
+    :param status: HTTP status code
+    :param seconds: Time until the response headers were sent
+    :param size: Response body bytes
+    :param api_key: x-api-key of the request, logged and counted only as key_id
+    :param fields: Extra fields for the log line, e.g. cache='Hit' or file='WMT.csv'
+    """
+    key = key_id(api_key)
+    REQUESTS.inc(app=app, endpoint=endpoint, status=status)
+    LATENCY.observe(seconds, app=app, endpoint=endpoint)
+    RESPONSE_BYTES.inc(size, app=app, endpoint=endpoint)
+    API_KEY_REQUESTS.inc(app=app, key=key)
+    if not LOGGER.disabled:
+        record = {'time': datetime.now(timezone.utc).isoformat(timespec='milliseconds'), 'app': app,
+                  'endpoint': endpoint, 'status': status, 'ms': round(seconds * 1e3, 3), 'bytes': size, 'key': key}
+        record.update((name, value) for name, value in fields.items() if value is not None)
+        LOGGER.info(json.dumps(record))
+
+
+class InstrumentedStore:
+    """Wrap an S3ObjectStore or LocalObjectStore and time every call in dataportal_store_fetch_seconds."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getattr__(self, name):
+        method = getattr(self.store, name)
+        if not callable(method):
+            return method
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                STORE_FETCH.observe(time.perf_counter() - start, operation=name)
+        return timed
+
+
+class ASGIMetricsMiddleware:
+    """
+    ASGI middleware recording every HTTP request with record_request.
+
+    The endpoint label is the route template matched by the framework (e.g. '/data/{ticker}'),
+    and the byte count is what was actually sent, so streamed and gzipped bodies count correctly.
+
+    :param app: ASGI application to wrap
+    :param label: Value of the app label
+    """
+
+    def __init__(self, app, label='asgi'):
+        self.app = app
+        self.label = label
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        state = {'status': 500, 'seconds': None, 'bytes': 0}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                state['status'] = message['status']
+                state['seconds'] = time.perf_counter() - start
+            elif message['type'] == 'http.response.body':
+                state['bytes'] += len(message.get('body', b''))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get('route')
+            endpoint = scope.get('endpoint')
+            name = getattr(route, 'path', None) or getattr(endpoint, '__name__', None) or 'unmatched'
+            headers = dict(scope.get('headers') or [])
+            api_key = headers.get(b'x-api-key')
+            seconds = state['seconds'] if state['seconds'] is not None else time.perf_counter() - start
+            record_request(self.label, name, state['status'], seconds, state['bytes'],
+                           api_key.decode('latin-1') if api_key else None)
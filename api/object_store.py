@@ -0,0 +1,138 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+
+# Bucket of the Dataportal CSVs, see lambda_handler in documentationAPI.md
+BUCKET_NAME = os.environ.get("BUCKET_NAME", "sapientassets")
+
+# Sidecar files (e.g. the date offset indexes of csv_index.py) are kept apart from the CSVs
+SIDECAR_PREFIX = "index/"
+
+
+class S3ObjectStore:
+    """
+    Read CSVs from an S3 bucket.
+
+    head() and get() return dicts with the S3 ETag and LastModified of the object, so the API can
+    answer conditional requests from a HEAD request without downloading the body.
+
+    :param bucket: Bucket name
+    :param client: boto3 S3 client (default: a new boto3.client('s3'))
+    """
+
+    def __init__(self, bucket=BUCKET_NAME, client=None):
+        if client is None:
+            import boto3
+            client = boto3.client('s3')
+        self.bucket = bucket
+        self.client = client
+
+    def _not_found(self, error):
+        code = error.response.get('Error', {}).get('Code')
+        return code in ('404', 'NoSuchKey', 'NotFound')
+
+    def head(self, key):
+        """Metadata of one object; raises KeyError if it does not exist."""
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=key)
+        except self.client.exceptions.ClientError as e:
+            if self._not_found(e):
+                raise KeyError(key)
+            raise
+        return {'key': key, 'etag': response['ETag'], 'last_modified': response['LastModified'],
+                'size': response['ContentLength']}
+
+    def get(self, key):
+        """Metadata and body (bytes) of one object; raises KeyError if it does not exist."""
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+        except self.client.exceptions.NoSuchKey:
+            raise KeyError(key)
+        return {'key': key, 'etag': response['ETag'], 'last_modified': response['LastModified'],
+                'size': response['ContentLength'], 'body': response['Body'].read()}
+
+    def get_range(self, key, start):
+        """Bytes of an object from offset start to the end, with a ranged GET."""
+        response = self.client.get_object(Bucket=self.bucket, Key=key, Range=f"bytes={start}-")
+        return response['Body'].read()
+
+    def get_sidecar(self, name):
+        """Body of a sidecar file; raises KeyError if it does not exist."""
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=SIDECAR_PREFIX + name)['Body'].read()
+        except self.client.exceptions.NoSuchKey:
+            raise KeyError(name)
+
+    def put_sidecar(self, name, body):
+        self.client.put_object(Bucket=self.bucket, Key=SIDECAR_PREFIX + name, Body=body)
+
+    def list_keys(self):
+        paginator = self.client.get_paginator('list_objects_v2')
+        return [item['Key'] for page in paginator.paginate(Bucket=self.bucket) for item in page.get('Contents', [])
+                if not item['Key'].startswith(SIDECAR_PREFIX)]
+
+
+class LocalObjectStore:
+    """
+    Stand-in for S3ObjectStore that reads files from a local directory, e.g. tokens/.
+
+    ETags are the quoted MD5 of the content like S3 ETags of single-part uploads, and
+    LastModified is the file modification time.
+
+    :param root: Directory holding the objects
+    :param suffix: Only files with this suffix are objects (default '.csv', like the bucket)
+    """
+
+    def __init__(self, root, suffix='.csv'):
+        self.root = root
+        self.suffix = suffix
+        self._etags = {}
+
+    def _path(self, key):
+        path = os.path.join(self.root, key)
+        # Keys are plain file names; never serve anything outside the root
+        if os.path.dirname(os.path.normpath(key)) or not key.endswith(self.suffix) or not os.path.isfile(path):
+            raise KeyError(key)
+        return path
+
+    def head(self, key):
+        path = self._path(key)
+        stat = os.stat(path)
+        cached = self._etags.get(key)
+        if cached is None or cached[0] != (stat.st_mtime_ns, stat.st_size):
+            with open(path, 'rb') as f:
+                cached = ((stat.st_mtime_ns, stat.st_size), f'"{hashlib.md5(f.read()).hexdigest()}"')
+            self._etags[key] = cached
+        return {'key': key, 'etag': cached[1], 'size': stat.st_size,
+                'last_modified': datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)}
+
+    def get(self, key):
+        result = self.head(key)
+        with open(self._path(key), 'rb') as f:
+            result['body'] = f.read()
+        return result
+
+    def get_range(self, key, start):
+        with open(self._path(key), 'rb') as f:
+            f.seek(start)
+            return f.read()
+
+    def _sidecar_path(self, name):
+        return os.path.join(self.root, '.' + SIDECAR_PREFIX.rstrip('/'), os.path.basename(name))
+
+    def get_sidecar(self, name):
+        try:
+            with open(self._sidecar_path(name), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(name)
+
+    def put_sidecar(self, name, body):
+        path = self._sidecar_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(body)
+
+    def list_keys(self):
+        return sorted(name for name in os.listdir(self.root)
+                      if name.endswith(self.suffix) and os.path.isfile(os.path.join(self.root, name)))
@@ -0,0 +1,182 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+from collections import deque
+
+import aiohttp
+
+from async_client import backoff_delay
+
+# Base URL of asgi_app.py; set DATAPORTAL_STREAM_URL to use another server
+STREAM_URL = os.environ.get("DATAPORTAL_STREAM_URL", "http://127.0.0.1:8000")
+
+
+async def stream_candles(tickers, base_url=STREAM_URL, last_event_id=None, max_retries=None):
+    """
+    Yield candle dicts from the /stream endpoint, reconnecting when the connection drops.
+
+    After a reconnect the server resends the candles missed since the last received event id,
+    so no update is lost. A candle with the date of the previous one is an update of that candle.
+
+    :param tickers: Tickers to subscribe to, e.g. ['WMT', 'SNEK']
+    :param base_url: Base URL of the server
+    :param last_event_id: Resume after this event id instead of starting with the latest candles
+    :param max_retries: Give up after this many failed connections in a row (default: never)
+    """
+    url = base_url.rstrip('/') + '/stream'
+    params = {'tickers': ','.join(tickers)}
+    failures = 0
+    timeout = aiohttp.ClientTimeout(total=None, sock_read=60)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        while True:
+            headers = {'Accept': 'text/event-stream'}
+            if last_event_id is not None:
+                headers['Last-Event-ID'] = str(last_event_id)
+            retry_after = None
+            try:
+                async with session.get(url, params=params, headers=headers) as response:
+                    if response.status == 404:
+                        raise ValueError((await response.json())['error'])
+                    response.raise_for_status()
+                    failures = 0
+                    event = {}
+                    async for line in response.content:
+                        line = line.decode('utf-8').rstrip('\r\n')
+                        if not line:
+                            # A blank line ends an event
+                            if event.get('event') == 'candle':
+                                last_event_id = event.get('id', last_event_id)
+                                yield json.loads(event['data'])
+                            event = {}
+                        elif line.startswith('retry:'):
+                            retry_after = int(line[6:].strip()) / 1000
+                        elif not line.startswith(':') and ':' in line:
+                            field, value = line.split(':', 1)
+                            event[field] = value[1:] if value.startswith(' ') else value
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+            failures += 1
+            if max_retries is not None and failures > max_retries:
+                raise ConnectionError(f"Stream {url} unavailable after {failures} attempts")
+            await asyncio.sleep(backoff_delay(failures - 1, retry_after=retry_after))
+
+
+class StreamingSMA:
+    """
+    Fast and slow simple moving averages of the close, updated in O(1) per candle.
+
+    A candle with the same date as the previous one replaces it, so intraday updates of the
+    current daily candle move the averages without counting the day twice.
+
+    :param fast: Window of the fast average in candles
+    :param slow: Window of the slow average in candles
+    """
+
+    def __init__(self, fast=7, slow=30):
+        self.windows = {'fast': fast, 'slow': slow}
+        self._values = {name: deque() for name in self.windows}
+        self._sums = {name: 0.0 for name in self.windows}
+        self._last_date = None
+        self._last_signal = None
+
+    def _push(self, value, replace):
+        for name, window in self.windows.items():
+            values = self._values[name]
+            if replace and values:
+                self._sums[name] -= values.pop()
+            values.append(value)
+            self._sums[name] += value
+            if len(values) > window:
+                self._sums[name] -= values.popleft()
+
+    def value(self, name):
+        values = self._values[name]
+        return self._sums[name] / len(values) if len(values) == self.windows[name] else math.nan
+
+    def update(self, candle):
+        """
+        Add one candle.
+
+        :return: Dict with the date, close, both averages and 'signal' ('buy' or 'sell' when the
+            fast average crosses the slow one, None otherwise)
+        """
+        replace = candle['date'] == self._last_date
+        self._push(float(candle['close']), replace)
+        self._last_date = candle['date']
+        fast, slow = self.value('fast'), self.value('slow')
+        signal = None
+        if not math.isnan(slow):
+            state = 'buy' if fast > slow else 'sell'
+            signal = state if state != self._last_signal and self._last_signal is not None else None
+            self._last_signal = state
+        return {'date': candle['date'], 'close': candle['close'], 'fast': fast, 'slow': slow, 'signal': signal}
+
+
+async def follow(tickers, make_indicator=StreamingSMA, on_result=None, final_only=False, base_url=STREAM_URL,
+                 history=None):
+    """
+    Feed live candles of each ticker into its own incremental indicator or strategy.
+
+    Any object with an update(candle) method works, e.g. CandleOutlierMonitor from
+    tokens/streaming_outliers.py. Indicators that cannot revise a candle should use
+    final_only=True: a candle is then only passed on once the next date arrives. The last
+    history candle is held back the same way, since the stream starts with that candle again.
+
+    :param tickers: Tickers to follow
+    :param make_indicator: Called without arguments to create one indicator per ticker
+    :param on_result: Called with (ticker, candle, result of update) (default: print)
+    :param final_only: Only pass completed candles
+    :param base_url: Base URL of the server
+    :param history: Optional dict ticker -> list of past candles to warm the indicators up with
+    """
+    indicators = {ticker: make_indicator() for ticker in tickers}
+    pending = {}
+    if on_result is None:
+        def on_result(ticker, candle, result):
+            print(ticker, result)
+    for ticker, candles in (history or {}).items():
+        candles = list(candles)
+        if final_only and candles:
+            # The current day may still change and is resent as the first candle of the stream
+            pending[ticker] = candles.pop()
+        for candle in candles:
+            indicators[ticker].update(candle)
+
+    async for candle in stream_candles(tickers, base_url):
+        ticker = candle.pop('ticker')
+        if final_only:
+            previous = pending.get(ticker)
+            if previous is not None and candle['date'] < previous['date']:
+                continue
+            pending[ticker] = candle
+            if previous is None or previous['date'] == candle['date']:
+                continue
+            candle = previous
+        on_result(ticker, candle, indicators[ticker].update(candle))
+
+
+if __name__ == "__main__":
+    import requests
+
+    parser = argparse.ArgumentParser(description="Follow live candles with a moving average crossover")
+    parser.add_argument('tickers', nargs='*', default=['WMT', 'SNEK'])
+    parser.add_argument('--url', default=STREAM_URL, help="Base URL of asgi_app.py")
+    parser.add_argument('--fast', type=int, default=7)
+    parser.add_argument('--slow', type=int, default=30)
+    args = parser.parse_args()
+
+    # Warm the averages up with the recent history of the batch endpoint, then follow the stream
+    recent = requests.get(args.url.rstrip('/') + '/data', params={'files': ','.join(args.tickers)}, timeout=30).json()
+    history = {ticker: rows[-args.slow:] for ticker, rows in recent.items()}
+
+    def report(ticker, candle, result):
+        print(f"{ticker} {result['date']} close {result['close']:.6f} fast {result['fast']:.6f} "
+              f"slow {result['slow']:.6f}" + (f" -> {result['signal'].upper()}" if result['signal'] else ""))
+
+    try:
+        asyncio.run(follow(args.tickers, lambda: StreamingSMA(args.fast, args.slow), report, base_url=args.url,
+                           history=history))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,160 @@
+import csv
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+# Token CSVs of the repository, next to this folder
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tokens')
+
+
+class TimeSeriesStore:
+    """
+    In-memory token time series with indexed point and range queries.
+
+    Each ticker is kept as a sorted datetime64 array of dates plus one float array per column.
+    Every row is serialized to JSON once at load time, so a query is two binary searches
+    (np.searchsorted) and a join of pre-serialized rows. Responses are cached by
+    (ticker, first row, last row), so different date strings selecting the same rows share
+    one cache entry.
+
+    :param data_dir: Directory with the token CSVs (date first, numeric columns after)
+    :param tickers: Tickers to load (default: every CSV in data_dir)
+    :param cache_size: Maximum number of cached responses
+    """
+
+    def __init__(self, data_dir=DATA_DIR, tickers=None, cache_size=4096):
+        self.data_dir = data_dir
+        self.cache_size = cache_size
+        self.series = {}
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if tickers is None:
+            tickers = sorted(name[:-4] for name in os.listdir(data_dir) if name.endswith('.csv'))
+        for ticker in tickers:
+            self.load(ticker)
+
+    def load(self, ticker):
+        """(Re)load one ticker from its CSV and drop its cached responses."""
+        self.install(ticker, self.read(ticker))
+
+    def read(self, ticker):
+        """
+        Parse the CSV of one ticker without touching the store.
+
+        This is the slow part of a reload, so a server can run it in a worker thread
+        and only call install on its event loop.
+        """
+        with open(os.path.join(self.data_dir, f"{ticker}.csv"), newline='') as f:
+            lines = [row for row in csv.reader(f) if row]
+        columns = [name.strip() for name in lines[0]]
+        rows = lines[1:]
+
+        dates = np.array([row[0].strip().replace(' ', 'T') for row in rows], dtype='datetime64[s]')
+        # Some exports quote numbers with thousands separators ("333,540")
+        values = np.array([[value.replace(',', '') or 'nan' for value in row[1:]] for row in rows],
+                          dtype=float).reshape(len(rows), -1)
+        order = np.argsort(dates, kind='stable')
+        dates, values = dates[order], values[order]
+
+        labels = [str(date)[:10] if str(date).endswith('T00:00:00') else str(date) for date in dates]
+        serialized = [json.dumps(dict(zip(columns, [label] + [None if np.isnan(v) else v for v in row.tolist()])))
+                      for label, row in zip(labels, values)]
+        return {
+            'columns': columns,
+            'dates': dates,
+            'values': values,
+            'labels': labels,
+            'rows': serialized,
+        }
+
+    def install(self, ticker, series):
+        """Replace the data of one ticker with the result of read and drop its cached responses."""
+        self.series[ticker] = series
+        for key in [key for key in self._cache if key[0] == ticker]:
+            del self._cache[key]
+
+    @staticmethod
+    def _to_datetime(value):
+        # Accepts '2024-05-01', '2024-05-01T12:00:00' or '2024-05-01 12:00:00'; raises ValueError otherwise
+        return np.datetime64(str(value).strip().replace(' ', 'T'), 's')
+
+    def _series(self, ticker):
+        try:
+            return self.series[ticker]
+        except KeyError:
+            raise KeyError(f"Unknown ticker '{ticker}'")
+
+    def bounds(self, ticker, start=None, end=None):
+        """Row slice [first, last) of the dates between start and end, both inclusive."""
+        dates = self._series(ticker)['dates']
+        first = 0 if start is None else int(np.searchsorted(dates, self._to_datetime(start), side='left'))
+        last = len(dates) if end is None else int(np.searchsorted(dates, self._to_datetime(end), side='right'))
+        return first, max(first, last)
+
+    def point(self, ticker, date):
+        """Row of one date as a dict, or None if the ticker has no row on that date."""
+        series = self._series(ticker)
+        target = self._to_datetime(date)
+        i = int(np.searchsorted(series['dates'], target, side='left'))
+        if i == len(series['dates']) or series['dates'][i] != target:
+            return None
+        return json.loads(series['rows'][i])
+
+    def range(self, ticker, start=None, end=None):
+        """Columns of the rows between start and end as a dict of arrays."""
+        series = self._series(ticker)
+        first, last = self.bounds(ticker, start, end)
+        result = {'date': series['dates'][first:last]}
+        for i, name in enumerate(series['columns'][1:]):
+            result[name] = series['values'][first:last, i]
+        return result
+
+    def _rows_json(self, ticker, first, last):
+        key = (ticker, first, last)
+        body = self._cache.get(key)
+        if body is None:
+            self.misses += 1
+            body = '[' + ','.join(self.series[ticker]['rows'][first:last]) + ']'
+            self._cache[key] = body
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self.hits += 1
+            self._cache.move_to_end(key)
+        return body
+
+    def point_json(self, ticker, date):
+        """Pre-serialized {date: row} response, or None if there is no row on that date."""
+        first, last = self.bounds(ticker, date, date)
+        if first == last:
+            return None
+        return '{' + json.dumps(self.series[ticker]['labels'][first]) + ':' + self.series[ticker]['rows'][first] + '}'
+
+    def range_json(self, tickers, start=None, end=None):
+        """Pre-serialized {ticker: [rows]} response for one or more tickers."""
+        parts = []
+        for ticker in tickers:
+            first, last = self.bounds(ticker, start, end)
+            parts.append(json.dumps(ticker) + ':' + self._rows_json(ticker, first, last))
+        return '{' + ','.join(parts) + '}'
+
+
+if __name__ == "__main__":
+    import time
+
+    store = TimeSeriesStore()
+    print(f"Loaded {len(store.series)} tickers")
+
+    n = 100000
+    start = time.perf_counter()
+    for _ in range(n):
+        store.range_json(['SNEK'], '2024-01-01', '2024-03-31')
+    print(f"Cached range query: {(time.perf_counter() - start) / n * 1e6:.1f} us")
+
+    start = time.perf_counter()
+    for _ in range(n):
+        store.point_json('SNEK', '2024-02-01')
+    print(f"Point query: {(time.perf_counter() - start) / n * 1e6:.1f} us")
@@ -0,0 +1,112 @@
+import csv
+import gzip
+import io
+import json
+import os
+
+import numpy as np
+
+# Response formats: the legacy JSON wrapper {"data": csv}, plain CSV text and a NumPy record array
+FORMATS = {
+    'json': 'application/json',
+    'csv': 'text/csv',
+    'npy': 'application/x-npy',
+}
+MEDIA_TYPES = {media_type: name for name, media_type in FORMATS.items()}
+
+# Bodies smaller than this are sent uncompressed, gzip would not pay for its header
+GZIP_MIN_SIZE = 512
+
+# Gzip whenever the client sends Accept-Encoding: gzip. Gzipped bodies leave the Lambda base64
+# encoded and only decode if the API Gateway stage lists */* as a binary media type, so this
+# stays off (gzip only with format=csv.gz etc.) until the stage is configured that way.
+GZIP_ON_ACCEPT_ENCODING = os.environ.get("GZIP_ON_ACCEPT_ENCODING", "0") == "1"
+
+
+def negotiate(params, accept=None, accept_encoding=None):
+    """
+    Pick the response format and whether to gzip it.
+
+    An explicit format= parameter wins over the Accept header; 'csv.gz' asks for gzip directly.
+    Without either, the legacy JSON wrapper is returned so existing clients keep working.
+    Accept-Encoding alone only turns gzip on if GZIP_ON_ACCEPT_ENCODING is set, since requests
+    and aiohttp send it by default.
+
+    :param params: Query parameters
+    :param accept: Accept request header
+    :param accept_encoding: Accept-Encoding request header
+    :return: (format name, use gzip); raises ValueError for an unknown format
+    """
+    requested = (params or {}).get('format')
+    compress = GZIP_ON_ACCEPT_ENCODING and 'gzip' in (accept_encoding or '').lower()
+    if requested:
+        if requested.endswith('.gz'):
+            requested, compress = requested[:-3], True
+        if requested not in FORMATS:
+            raise ValueError(requested)
+        return requested, compress
+    for media_type in (accept or '').split(','):
+        name = MEDIA_TYPES.get(media_type.split(';')[0].strip())
+        if name is not None:
+            return name, compress
+    return 'json', compress
+
+
+def csv_to_records(text):
+    """
+    Parse CSV text (date first, numeric columns after) into a NumPy record array.
+
+    :return: Structured array with a datetime64[s] 'date' field and float64 fields for the other columns
+    """
+    lines = [row for row in csv.reader(io.StringIO(text)) if row]
+    columns = [name.strip() for name in lines[0]]
+    dtype = [(columns[0], 'datetime64[s]')] + [(name, 'float64') for name in columns[1:]]
+    records = np.empty(len(lines) - 1, dtype=dtype)
+    if len(records):
+        rows = lines[1:]
+        records[columns[0]] = np.array([row[0].strip().replace(' ', 'T') for row in rows], dtype='datetime64[s]')
+        # Some exports quote numbers with thousands separators ("1,527,605")
+        values = np.array([[value.replace(',', '').strip() or 'nan' for value in row[1:]] for row in rows],
+                          dtype=float).reshape(len(rows), -1)
+        for i, name in enumerate(columns[1:]):
+            records[name] = values[:, i]
+    return records
+
+
+def encode(text, fmt, compress=False):
+    """
+    Serialize CSV text in a response format.
+
+    :return: (body bytes, headers dict with Content-Type and, if compressed, Content-Encoding)
+    """
+    if fmt == 'json':
+        body = json.dumps({'data': text}).encode('utf-8')
+    elif fmt == 'csv':
+        body = text.encode('utf-8')
+    else:
+        buffer = io.BytesIO()
+        np.save(buffer, csv_to_records(text), allow_pickle=False)
+        body = buffer.getvalue()
+
+    headers = {'Content-Type': FORMATS[fmt], 'Vary': 'Accept, Accept-Encoding'}
+    if compress and len(body) >= GZIP_MIN_SIZE:
+        body = gzip.compress(body, compresslevel=6, mtime=0)
+        headers['Content-Encoding'] = 'gzip'
+    return body, headers
+
+
+def decode(content, content_type):
+    """
+    Decode a response body (already decompressed by the HTTP client) into a record array.
+
+    :param content: Body bytes
+    :param content_type: Content-Type header of the response
+    :return: Structured NumPy array with one field per column
+    """
+    media_type = (content_type or '').split(';')[0].strip()
+    if media_type == FORMATS['npy']:
+        return np.load(io.BytesIO(content), allow_pickle=False)
+    text = content.decode('utf-8')
+    if media_type == FORMATS['json']:
+        text = json.loads(text)['data']
+    return csv_to_records(text)
@@ -11,6 +11,10 @@ import matplotlib.pyplot as plt
 from matplotlib.dates import DateFormatter
 from scipy import stats
 
+from basket_engine import basket_values, load_metadata
+from equity_metrics import return_metrics
+from rolling_quantile import rolling_var
+
 def load_data(tokens):
     dataframes = {}
     for token in tokens:
@@ -39,22 +43,13 @@ def calculate_equal_weight_basket(dataframes, tokens):
     equal_weight_basket = combined_df.mean(axis=1)
     return equal_weight_basket
 
-def calculate_market_cap_weight_basket(dataframes, tokens, token_supplies):
+def calculate_market_cap_weight_basket(dataframes, tokens, metadata, freq='MS'):
     combined_df = pd.concat([df['close'] for df in dataframes.values()], axis=1, keys=tokens)
     
-    market_cap_basket = pd.Series(dtype=float)
-    
-    for month_start, month_group in combined_df.groupby(pd.Grouper(freq='MS')):
-        if month_group.empty:
-            continue
-        
-        market_caps = month_group.iloc[0] * token_supplies
-        weights = market_caps / market_caps.sum()
-        
-        month_basket = (month_group * weights).sum(axis=1)
-        market_cap_basket = pd.concat([market_cap_basket, month_basket])
+    # Weights are fixed at the first date of each rebalance period, for all periods at once
+    market_cap_basket = basket_values(combined_df, {'Market Cap Weight Basket': tokens}, metadata, freq=freq)
     
-    return market_cap_basket
+    return market_cap_basket['Market Cap Weight Basket']
 
 def calculate_descriptive_stats(results, start_date='2023-01-01', end_date='2023-12-31', risk_free_rate=0.05):
     """
@@ -111,10 +106,11 @@ def calculate_and_plot_var(results, start_date='2023-01-01', end_date='2023-12-3
     # Calculate daily returns
     daily_returns = period_results.pct_change().dropna()
     
-    # Calculate 20-day rolling VaR for both baskets
+    # Calculate 20-day rolling VaR for both baskets with a rolling quantile of each column
     window = 20
-    var_equal = daily_returns['Equal Weight Basket'].rolling(window=window).apply(lambda x: calculate_var(x, confidence_level))
-    var_market_cap = daily_returns['Market Cap Weight Basket'].rolling(window=window).apply(lambda x: calculate_var(x, confidence_level))
+    rolling = rolling_var(daily_returns[['Equal Weight Basket', 'Market Cap Weight Basket']], window, confidence_level)
+    var_equal = rolling['Equal Weight Basket']
+    var_market_cap = rolling['Market Cap Weight Basket']
     
     # Calculate cumulative returns
     cumulative_returns_equal = (1 + daily_returns['Equal Weight Basket']).cumprod()
@@ -169,17 +165,10 @@ def calculate_descriptive_stats(results, start_date='2023-01-01', end_date='2023
     # Calculate daily returns
     daily_returns = period_results.pct_change().dropna()
     
-    # Initialize stats DataFrame
-    stats = pd.DataFrame(index=['Equal Weight Basket', 'Market Cap Weight Basket'])
-    
-    for column in daily_returns.columns:
-        returns = daily_returns[column]
-        
-        stats.loc[column, 'Standard Deviation'] = returns.std()
-        stats.loc[column, 'Annualized Volatility'] = returns.std() * np.sqrt(252)  # Assuming 252 trading days
-        stats.loc[column, 'Annualized Return'] = (1 + returns.mean()) ** 252 - 1
-        stats.loc[column, 'Sharpe Ratio'] = (stats.loc[column, 'Annualized Return'] - risk_free_rate) / stats.loc[column, 'Annualized Volatility']
-        stats.loc[column, f'VaR ({confidence_level*100}%)'] = calculate_var(returns, confidence_level)
+    # Statistics for all baskets in one vectorized pass (252 trading days per year)
+    metrics = return_metrics(daily_returns.to_numpy().T, risk_free_rate, confidence_level)
+    columns = ['Standard Deviation', 'Annualized Volatility', 'Annualized Return', 'Sharpe Ratio', f'VaR ({confidence_level*100}%)']
+    stats = pd.DataFrame({column: metrics[column] for column in columns}, index=daily_returns.columns)
     
     # Calculate correlation between baskets
     correlation = daily_returns['Equal Weight Basket'].corr(daily_returns['Market Cap Weight Basket'])
@@ -224,7 +213,7 @@ def plot_baskets(results):
     
 def main():
     tokens = ['MIN', 'MILK', 'GENS', 'SUNDAE', 'WRT']
-    token_supplies = [3000000000, 10000000, 100000000, 2000000000, 100000000]
+    metadata = load_metadata()
     
     dataframes = load_data(tokens)
     
@@ -233,7 +222,7 @@ def main():
         return
     
     equal_weight_basket = calculate_equal_weight_basket(dataframes, tokens)
-    market_cap_weight_basket = calculate_market_cap_weight_basket(dataframes, tokens, token_supplies)
+    market_cap_weight_basket = calculate_market_cap_weight_basket(dataframes, tokens, metadata)
     
     # Combine results into a single DataFrame
     results = pd.DataFrame({
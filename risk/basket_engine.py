@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized basket construction with periodic rebalancing.
+
+calculate_market_cap_weight_basket used to loop over months and grow the result with
+pd.concat, which is quadratic in the length of the history. Here the prices on each
+rebalance date are forward-filled into an anchor matrix in one step, market caps come
+from the token metadata table (token_metadata.csv: supply and listing date), and the
+values of any number of baskets are two matrix products over the same anchor matrix.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+RISK_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(RISK_DIR, '..', 'tokens')
+METADATA_FILE = os.path.join(RISK_DIR, 'token_metadata.csv')
+
+
+def load_metadata(path=METADATA_FILE):
+    """
+    Load the token metadata table.
+
+    :param path: CSV with token, supply and listing_date columns
+    :return: DataFrame indexed by token
+    """
+    metadata = pd.read_csv(path, parse_dates=['listing_date'])
+    return metadata.set_index('token')
+
+
+def load_prices(tokens, data_dir=DATA_DIR, field='close'):
+    """
+    Load one price field for several tokens into a single date x token frame.
+
+    :param tokens: List of tickers, e.g. ['MIN', 'MILK']
+    :param data_dir: Directory with the token CSVs (default: ../tokens)
+    :param field: Column to load (default 'close')
+    :return: DataFrame indexed by date with one column per token (outer join on dates)
+    """
+    series = {}
+    for token in tokens:
+        df = pd.read_csv(os.path.join(data_dir, f"{token}.csv"), usecols=['date', field])
+        df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d')
+        series[token] = df.set_index('date')[field]
+    return pd.DataFrame(series).sort_index()
+
+
+def rebalance_dates(index, freq='MS'):
+    """
+    Map every date to the rebalance date of its period.
+
+    The rebalance date is the first date of the period present in the index,
+    so a month starting on a missing day rebalances on its first available day.
+
+    :param index: DatetimeIndex of the price data
+    :param freq: Any pandas frequency, e.g. 'MS' (monthly), 'W-MON', 'QS'
+    :return: DatetimeIndex aligned with index
+    """
+    marker = pd.Series(index, index=index)
+    return pd.DatetimeIndex(marker.groupby(pd.Grouper(freq=freq)).transform('first'))
+
+
+def rebalance_weights(prices, metadata, freq='MS', weighting='market_cap'):
+    """
+    Weights of every token at each date, fixed at the last rebalance date.
+
+    :param prices: DataFrame of prices, date x token
+    :param metadata: Token metadata indexed by token (see load_metadata)
+    :param freq: Rebalance frequency as a pandas frequency (default monthly)
+    :param weighting: 'market_cap' (price x supply) or 'equal'
+    :return: Unnormalized weights (market caps or ones), date x token; NaN where a token is not held
+    """
+    # A token without a row would silently count as listed since the first date
+    missing = [token for token in prices.columns if token not in metadata.index]
+    if missing:
+        raise ValueError(f"No row in the token metadata for: {', '.join(missing)}")
+    anchors = rebalance_dates(prices.index, freq)
+    anchor_prices = prices.loc[anchors].to_numpy()
+
+    if weighting == 'market_cap':
+        supplies = metadata.reindex(prices.columns)['supply']
+        if supplies.isna().any():
+            missing = ', '.join(supplies[supplies.isna()].index)
+            raise ValueError(f"No supply in the token metadata for: {missing}")
+        raw = anchor_prices * supplies.to_numpy()
+    elif weighting == 'equal':
+        raw = np.where(np.isnan(anchor_prices), np.nan, 1.0)
+    else:
+        raise ValueError(f"Unknown weighting: {weighting}")
+
+    # Tokens are only eligible from their listing date onwards
+    if 'listing_date' in metadata.columns:
+        listed = metadata.reindex(prices.columns)['listing_date'].to_numpy()
+        not_listed = anchors.to_numpy()[:, None] < listed[None, :]
+        raw = np.where(not_listed, np.nan, raw)
+
+    return pd.DataFrame(raw, index=prices.index, columns=prices.columns)
+
+
+def basket_values(prices, baskets, metadata, freq='MS', weighting='market_cap'):
+    """
+    Values of many baskets at once.
+
+    Each basket is worth sum(w_i * price_i) with weights w_i = cap_i / sum(cap) fixed at the
+    last rebalance date, matching the original month-by-month loop.
+
+    :param prices: DataFrame of prices, date x token
+    :param baskets: Dict basket name -> list of tokens (every token must be a column of prices)
+    :param metadata: Token metadata indexed by token
+    :param freq: Rebalance frequency (default 'MS')
+    :param weighting: 'market_cap' or 'equal'
+    :return: DataFrame date x basket
+    """
+    tokens = sorted({token for members in baskets.values() for token in members})
+    prices = prices[tokens]
+    raw = rebalance_weights(prices, metadata, freq, weighting).to_numpy()
+
+    membership = np.zeros((len(baskets), len(tokens)))
+    for b, members in enumerate(baskets.values()):
+        membership[b, [tokens.index(token) for token in members]] = 1.0
+
+    numerator = np.nan_to_num(raw * prices.to_numpy()) @ membership.T
+    denominator = np.nan_to_num(raw) @ membership.T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        values = np.where(denominator > 0, numerator / denominator, np.nan)
+    return pd.DataFrame(values, index=prices.index, columns=list(baskets))
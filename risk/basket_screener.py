@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Screen every k-token equal-weight basket of the token universe.
+
+main() in asset-basket-analysis.py studies one hand-picked basket. This screener ranks all
+C(n, k) baskets instead (15,504 five-token baskets of the 20 listed tokens). The mean vector,
+covariance matrix and correlation matrix of the daily token returns are computed once; the
+statistics of a basket are then sums over its rows and columns of those matrices, gathered
+for a whole chunk of baskets with fancy indexing. Chunks are generated lazily and handed to
+a process pool with imap, so they are built while the workers run instead of all up front.
+
+Tokens listed on different dates, so the moments are computed pairwise over the days on which
+both tokens traded (as DataFrame.cov does). VaR is parametric (normal) here because the
+baskets share no common return history; use calculate_var or monte_carlo.py to check a
+shortlisted basket against its actual returns.
+"""
+
+from itertools import combinations, islice
+from math import comb
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+TRADING_DAYS = 252  # Same annualization as calculate_descriptive_stats
+
+UNIVERSE = ['AGIX', 'BOOK', 'COPI', 'EMP', 'FLDT', 'GENS', 'HUNT', 'IAG', 'INDY', 'LENFI',
+            'MELD', 'MILK', 'MIN', 'NEWM', 'NMKR', 'NTX', 'SNEK', 'SUNDAE', 'WMT', 'WRT']
+
+_WORKER_SPEC = None
+
+
+def _init_worker(spec):
+    global _WORKER_SPEC
+    _WORKER_SPEC = spec
+
+
+def _combination_chunks(n_tokens, k, chunk_size):
+    # Arrays of shape (chunk, k) of token indices, in lexicographic order
+    iterator = combinations(range(n_tokens), k)
+    while True:
+        chunk = np.array(list(islice(iterator, chunk_size)), dtype=np.intp)
+        if not len(chunk):
+            return
+        yield chunk
+
+
+def _basket_statistics(members):
+    spec = _WORKER_SPEC
+    k = members.shape[1]
+    rows, columns = members[:, :, None], members[:, None, :]
+
+    mean = spec['mean'][members].mean(axis=1)
+    variance = np.clip(spec['covariance'][rows, columns].sum(axis=(1, 2)) / k ** 2, 0, None)
+    # Off-diagonal average of the correlation sub-matrix
+    correlation = (spec['correlation'][rows, columns].sum(axis=(1, 2)) - k) / (k * (k - 1)) if k > 1 \
+        else np.ones(len(members))
+    common_days = spec['counts'][rows, columns].min(axis=(1, 2))
+    return members, mean, variance, correlation, common_days
+
+
+def pairwise_moments(returns, min_periods=20):
+    """
+    Mean, covariance, correlation and common-day counts of the token returns.
+
+    :param returns: DataFrame of daily simple returns, date x token
+    :param min_periods: Minimum number of common days per pair; pairs below it are NaN
+    :return: Dict of arrays (mean of shape (N,), the others of shape (N, N))
+    """
+    mask = returns.notna().to_numpy(dtype=np.int64)
+    return {
+        'mean': returns.mean().to_numpy(),
+        'covariance': returns.cov(min_periods=min_periods).to_numpy(),
+        'correlation': returns.corr(min_periods=min_periods).to_numpy(),
+        'counts': mask.T @ mask,
+    }
+
+
+def screen_baskets(returns, k=5, risk_free_rate=0.05, confidence_level=0.95, rank_by='Sharpe Ratio',
+                   min_periods=20, chunk_size=20000, max_workers=None):
+    """
+    Statistics for every equal-weight basket of k tokens, ranked.
+
+    :param returns: DataFrame of daily simple returns, date x token
+    :param k: Tokens per basket
+    :param risk_free_rate: Annual risk-free rate (default 5%)
+    :param confidence_level: Confidence level for VaR (default 0.95)
+    :param rank_by: Column to sort by, highest first
+    :param min_periods: Minimum number of common days per token pair
+    :param chunk_size: Baskets per chunk
+    :param max_workers: Number of worker processes (default: one per CPU)
+    :return: DataFrame with one row per basket, best first
+    """
+    tokens = list(returns.columns)
+    if not 1 <= k <= len(tokens):
+        raise ValueError(f"Cannot build {k}-token baskets from {len(tokens)} tokens")
+    spec = pairwise_moments(returns, min_periods)
+
+    with Pool(max_workers, initializer=_init_worker, initargs=(spec,)) as pool:
+        # imap takes the generator as is; each result carries its chunk, so none is kept here meanwhile
+        results = list(pool.imap(_basket_statistics, _combination_chunks(len(tokens), k, chunk_size)))
+
+    members, mean, variance, correlation, common_days = (np.concatenate(parts) for parts in zip(*results))
+
+    std = np.sqrt(variance)
+    annual_return = (1 + mean) ** TRADING_DAYS - 1
+    annual_volatility = std * np.sqrt(TRADING_DAYS)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table = pd.DataFrame({
+            'Basket': [', '.join(tokens[i] for i in row) for row in members],
+            'Standard Deviation': std,
+            'Annualized Volatility': annual_volatility,
+            'Annualized Return': annual_return,
+            'Sharpe Ratio': (annual_return - risk_free_rate) / annual_volatility,
+            f'VaR ({confidence_level*100}%)': mean + norm.ppf(1 - confidence_level) * std,
+            'Average Correlation': correlation,
+            'Common Days': common_days,
+        })
+    return table.sort_values(rank_by, ascending=False, na_position='last').reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    import time
+
+    from basket_engine import load_prices
+
+    returns = load_prices(UNIVERSE).pct_change(fill_method=None)
+
+    start = time.perf_counter()
+    table = screen_baskets(returns, k=5)
+    print(f"Screened {comb(len(UNIVERSE), 5):,} five-token baskets in {time.perf_counter() - start:.2f}s")
+
+    print("\nTop 10 baskets by Sharpe ratio:")
+    print(table.head(10).round(4).to_string(index=False))
+    print("\nTop 10 least correlated baskets:")
+    print(table.sort_values('Average Correlation').head(10).round(4).to_string(index=False))
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Risk-adjusted performance metrics for many equity curves at once.
+
+Heatmap sweeps only keep the final return of every parameter combination and
+calculate_descriptive_stats used to fill its table one basket at a time. Here a 2D array
+of equity curves (runs x time) is reduced to max drawdown, Calmar, Sortino, Sharpe, VaR and
+time under water for every run in one vectorized pass, so sweep results can be ranked by
+risk-adjusted metrics instead of raw return.
+
+Equity curves from a Backtrader sweep can be collected with the TimeReturn analyzer
+(cerebro.addanalyzer(bt.analyzers.TimeReturn)) and stacked into one array per sweep.
+The formulas follow calculate_descriptive_stats: 252 periods per year, annualized return
+(1 + mean)^252 - 1 and VaR as the (1 - confidence) percentile of the periodic returns.
+"""
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+
+
+def _longest_run(flags):
+    # Length of the longest run of True values in every row
+    n = flags.shape[1]
+    positions = np.broadcast_to(np.arange(1, n + 1), flags.shape)
+    last_reset = np.maximum.accumulate(np.where(flags, 0, positions), axis=1)
+    return (positions - last_reset).max(axis=1)
+
+
+def return_metrics(returns, risk_free_rate=0.05, confidence_level=0.95, periods=TRADING_DAYS):
+    """
+    Return-based metrics for every row of a 2D array of periodic returns.
+
+    :param returns: Array of shape (runs, T) of simple returns; NaN values are ignored
+    :param risk_free_rate: Annual risk-free rate (default 5%)
+    :param confidence_level: Confidence level for VaR (default 0.95)
+    :param periods: Periods per year (default 252)
+    :return: Dict metric name -> array of shape (runs,)
+    """
+    returns = np.atleast_2d(np.asarray(returns, dtype=float))
+    std = np.nanstd(returns, axis=1, ddof=1)
+    annual_return = (1 + np.nanmean(returns, axis=1)) ** periods - 1
+    annual_volatility = std * np.sqrt(periods)
+    downside = np.minimum(returns - risk_free_rate / periods, 0)
+    downside_deviation = np.sqrt(np.nanmean(downside ** 2, axis=1) * periods)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'Standard Deviation': std,
+            'Annualized Volatility': annual_volatility,
+            'Annualized Return': annual_return,
+            'Sharpe Ratio': (annual_return - risk_free_rate) / annual_volatility,
+            'Sortino Ratio': (annual_return - risk_free_rate) / downside_deviation,
+            f'VaR ({confidence_level*100}%)': np.nanpercentile(returns, 100 * (1 - confidence_level), axis=1),
+        }
+
+
+def drawdown_metrics(equity, periods=TRADING_DAYS):
+    """
+    Drawdown-based metrics for every row of a 2D array of equity curves.
+
+    :param equity: Array of shape (runs, T) of portfolio values
+    :param periods: Periods per year (default 252)
+    :return: Dict metric name -> array of shape (runs,)
+    """
+    equity = np.atleast_2d(np.asarray(equity, dtype=float))
+    peaks = np.maximum.accumulate(equity, axis=1)
+    drawdown = 1 - equity / peaks
+    under_water = drawdown > 0
+
+    years = (equity.shape[1] - 1) / periods
+    cagr = (equity[:, -1] / equity[:, 0]) ** (1 / years) - 1
+    max_drawdown = drawdown.max(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'Total Return': equity[:, -1] / equity[:, 0] - 1,
+            'CAGR': cagr,
+            'Max Drawdown': max_drawdown,
+            'Calmar Ratio': cagr / max_drawdown,
+            'Time Under Water': under_water.mean(axis=1),
+            'Longest Drawdown (periods)': _longest_run(under_water),
+        }
+
+
+def equity_curve_metrics(equity, risk_free_rate=0.05, confidence_level=0.95, periods=TRADING_DAYS, index=None):
+    """
+    All metrics for a batch of equity curves in one table.
+
+    :param equity: Array of shape (runs, T) or DataFrame with one curve per column (date x run)
+    :param risk_free_rate: Annual risk-free rate (default 5%)
+    :param confidence_level: Confidence level for VaR (default 0.95)
+    :param periods: Periods per year (default 252)
+    :param index: Labels for the runs (default: DataFrame columns or 0..runs-1)
+    :return: DataFrame with one row per run
+    """
+    if isinstance(equity, pd.DataFrame):
+        index = equity.columns if index is None else index
+        equity = equity.to_numpy(dtype=float).T
+    equity = np.atleast_2d(np.asarray(equity, dtype=float))
+    returns = equity[:, 1:] / equity[:, :-1] - 1
+
+    metrics = return_metrics(returns, risk_free_rate, confidence_level, periods)
+    metrics.update(drawdown_metrics(equity, periods))
+    return pd.DataFrame(metrics, index=index)
+
+
+def rank_runs(metrics, by='Calmar Ratio', ascending=False):
+    """Sort a metrics table by one column, e.g. to pick the best cell of a heatmap sweep."""
+    return metrics.sort_values(by, ascending=ascending)
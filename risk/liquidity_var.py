@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Liquidity-adjusted Value at Risk (LVaR) from the recorded trading volume.
+
+calculate_var assumes a position can be sold at the closing price, but many native tokens trade
+only a few thousand ADA a day. LVaR adds the cost of getting out to the price risk:
+
+* daily ADA volume = the volume column of tokens/*.csv, which is already denominated in ADA
+  (SNEK trades about 900k, WMT about 300k a day), averaged with a median over a lookback window
+  so single spikes do not inflate the depth. Sources that count volume in tokens, like the raw
+  exports csvCleaning.py converts with its 'ada_volume' column, use volume_unit='token'
+* liquidation days = position / (participation x ADA volume): only a fraction of the daily volume
+  is sold per day without moving the market on its own
+* exit cost = DEX fee + impact x daily volatility x sqrt(position / ADA volume), the square-root
+  market impact model
+* price risk = historical 1-day VaR scaled by the square root of the liquidation days
+
+LVaR = VaR over the liquidation period - exit cost, with the sign convention of calculate_var
+(a negative return for a loss). Every step broadcasts over position sizes x tokens, so the whole
+grid comes out of one call.
+"""
+
+import numpy as np
+import pandas as pd
+
+from basket_engine import DATA_DIR, load_prices
+
+
+def load_ada_volume(tokens, data_dir=DATA_DIR, lookback=30, volume_unit='ada'):
+    """
+    Typical daily ADA volume of every token.
+
+    The volume column of the token CSVs in this repository is in ADA, so it is the depth as is.
+    Multiplying it by the close (the ADA price) would count the price twice and understate the
+    depth of tokens priced below one ADA by orders of magnitude.
+
+    :param tokens: List of tickers
+    :param data_dir: Directory with the token CSVs
+    :param lookback: Number of most recent trading days to take the median over
+    :param volume_unit: 'ada' if the volume column is in ADA (default), 'token' if it counts tokens
+    :return: Series token -> median daily ADA volume
+    """
+    ada_volume = load_prices(tokens, data_dir, field='volume')
+    if volume_unit == 'token':
+        ada_volume = ada_volume * load_prices(tokens, data_dir, field='close')
+    elif volume_unit != 'ada':
+        raise ValueError(f"Unknown volume unit: {volume_unit}")
+    return pd.Series({token: ada_volume[token].dropna().tail(lookback).median() for token in tokens})
+
+
+def liquidity_var_components(returns, ada_volume, position_sizes, confidence_level=0.95, participation=0.1,
+                             impact=1.0, fee=0.003):
+    """
+    All parts of the LVaR for every position size and token.
+
+    :param returns: DataFrame of daily simple returns, date x token
+    :param ada_volume: Series token -> typical daily ADA volume (see load_ada_volume)
+    :param position_sizes: Position sizes in ADA
+    :param confidence_level: Confidence level for VaR (default 0.95)
+    :param participation: Fraction of the daily volume that can be sold per day
+    :param impact: Coefficient of the square-root impact model
+    :param fee: Proportional DEX fee paid on the exit
+    :return: Dict name -> DataFrame position size x token
+    """
+    tokens = list(returns.columns)
+    positions = np.asarray(position_sizes, dtype=float)[:, None]
+    volume = ada_volume.reindex(tokens).to_numpy(dtype=float)[None, :]
+    values = returns.to_numpy(dtype=float)
+
+    var = np.nanpercentile(values, 100 * (1 - confidence_level), axis=0)[None, :]
+    volatility = np.nanstd(values, axis=0, ddof=1)[None, :]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days = np.maximum(np.ceil(positions / (participation * volume)), 1)
+        exit_cost = np.minimum(fee + impact * volatility * np.sqrt(positions / volume), 1)
+        period_var = np.maximum(var * np.sqrt(days), -1)
+    lvar = np.maximum(period_var - exit_cost, -1)
+
+    grids = {
+        'Liquidation Days': days,
+        'VaR': period_var,
+        'Exit Cost': exit_cost,
+        'LVaR': lvar,
+        'LVaR (ADA)': lvar * positions,
+    }
+    index = pd.Index(np.asarray(position_sizes), name='position (ADA)')
+    return {name: pd.DataFrame(np.broadcast_to(grid, (len(index), len(tokens))), index=index, columns=tokens)
+            for name, grid in grids.items()}
+
+
+def liquidity_var(returns, ada_volume, position_sizes, confidence_level=0.95, **kwargs):
+    """
+    Position-size x token grid of the LVaR in ADA.
+
+    :param returns: DataFrame of daily simple returns, date x token
+    :param ada_volume: Series token -> typical daily ADA volume
+    :param position_sizes: Position sizes in ADA
+    :param confidence_level: Confidence level for VaR (default 0.95)
+    :param kwargs: Passed to liquidity_var_components (participation, impact, fee)
+    :return: DataFrame position size x token
+    """
+    return liquidity_var_components(returns, ada_volume, position_sizes, confidence_level, **kwargs)['LVaR (ADA)']
+
+
+def max_position(components, max_loss_fraction=0.25):
+    """
+    Largest position per token whose LVaR stays within a fraction of the position.
+
+    :param components: Output of liquidity_var_components
+    :param max_loss_fraction: Accepted LVaR as a fraction of the position, e.g. 0.25 for -25%
+    :return: Series token -> largest position size in the grid (NaN if none qualifies)
+    """
+    lvar = components['LVaR']
+    within = lvar >= -max_loss_fraction
+    return within.apply(lambda column: column[column].index.max())
+
+
+if __name__ == "__main__":
+    tokens = ['MIN', 'MILK', 'GENS', 'SUNDAE', 'WRT', 'SNEK', 'INDY', 'NTX']
+    returns = load_prices(tokens).pct_change(fill_method=None)
+    ada_volume = load_ada_volume(tokens)
+    positions = [1000, 5000, 10000, 50000, 100000, 500000, 1000000]
+
+    components = liquidity_var_components(returns, ada_volume, positions)
+    print("Median daily ADA volume (last 30 days):")
+    print(ada_volume.round(0).to_string())
+    print("\nLiquidity-adjusted VaR (95%) in ADA:")
+    print(components['LVaR (ADA)'].round(0).to_string())
+    print("\nDays to exit at 10% of daily volume:")
+    print(components['Liquidation Days'].to_string())
+    print("\nLargest position with LVaR within -25%:")
+    print(max_position(components).to_string())
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Batched portfolio optimization for the Sharpe, Sortino and Calmar ratios.
+
+Instead of solving one optimization problem per objective, a large set of candidate weight
+vectors is drawn from the constrained simplex and all of them are evaluated with matrix
+operations. The mean vector, covariance matrix and downside semicovariance matrix are computed
+once and cached, so Sharpe and Sortino ratios for all candidates are a single quadratic form
+each; the Calmar ratio needs drawdowns, which are computed from the candidate return paths in
+chunks to bound memory. Every ratio has its own efficient frontier: the highest return
+candidate for each level of its risk measure (volatility, downside deviation, max drawdown).
+"""
+
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252  # Same annualization as calculate_descriptive_stats
+
+RISK_MEASURES = {
+    'sharpe': 'volatility',
+    'sortino': 'downside_deviation',
+    'calmar': 'max_drawdown',
+}
+
+
+def sample_weights(n_tokens, n_candidates, min_weight=0.0, max_weight=1.0, seed=None):
+    """
+    Draw weight vectors uniformly from the simplex, then enforce the bounds.
+
+    A lower bound below zero allows short positions. The upper bound is enforced by capping
+    and redistributing the excess to the uncapped tokens in proportion to their weights.
+
+    :param n_tokens: Number of tokens
+    :param n_candidates: Number of weight vectors
+    :param min_weight: Lower bound per token (0 = long-only)
+    :param max_weight: Upper bound per token
+    :param seed: Random seed
+    :return: Array of shape (n_candidates, n_tokens) with rows summing to one
+    """
+    if n_tokens * max_weight < 1 or n_tokens * min_weight > 1:
+        raise ValueError("Weight bounds cannot be met with weights summing to one")
+
+    if np.isclose(n_tokens * max_weight, 1):
+        # The bounds leave only the equal-weight portfolio
+        return np.full((n_candidates, n_tokens), 1 / n_tokens)
+
+    rng = np.random.default_rng(seed)
+    # Shifted simplex: every weight >= min_weight and the row still sums to one
+    weights = min_weight + (1 - n_tokens * min_weight) * rng.dirichlet(np.ones(n_tokens), n_candidates)
+
+    for _ in range(n_tokens):
+        excess = np.clip(weights - max_weight, 0, None).sum(axis=1, keepdims=True)
+        if not excess.any():
+            break
+        capped = weights >= max_weight
+        weights = np.where(capped, max_weight, weights)
+        room = np.where(capped, 0.0, weights - min_weight)
+        total_room = room.sum(axis=1, keepdims=True)
+        # Rows without room left are already at the bounds
+        share = np.divide(room, total_room, out=np.zeros_like(room), where=total_room > 0)
+        weights = weights + excess * share
+    return weights
+
+
+class PortfolioOptimizer:
+    """
+    Evaluate many candidate portfolios over one return history.
+
+    :param returns: DataFrame of daily simple returns, date x token; rows with any NaN are dropped
+    :param risk_free_rate: Annual risk-free rate (default 5%, as in calculate_descriptive_stats)
+    :param chunk_size: Candidates per chunk when computing drawdowns
+    """
+
+    def __init__(self, returns, risk_free_rate=0.05, chunk_size=5000):
+        self.returns = returns.dropna()
+        self.tokens = list(self.returns.columns)
+        self.risk_free_rate = risk_free_rate
+        self.chunk_size = chunk_size
+        self._r = self.returns.to_numpy()
+
+    @cached_property
+    def mean(self):
+        return self._r.mean(axis=0)
+
+    @cached_property
+    def covariance(self):
+        return np.cov(self._r, rowvar=False)
+
+    @cached_property
+    def semicovariance(self):
+        # Downside semicovariance relative to the daily risk-free rate (Estrada)
+        target = self.risk_free_rate / TRADING_DAYS
+        downside = np.minimum(self._r - target, 0)
+        return downside.T @ downside / len(downside)
+
+    def evaluate(self, weights):
+        """
+        Risk and return statistics for a batch of candidate portfolios.
+
+        :param weights: Array of shape (n_candidates, n_tokens)
+        :return: DataFrame with one row per candidate
+        """
+        weights = np.asarray(weights, dtype=float)
+        annual_return = (1 + weights @ self.mean) ** TRADING_DAYS - 1
+        volatility = np.sqrt(np.einsum('kn,nm,km->k', weights, self.covariance, weights) * TRADING_DAYS)
+        downside = np.sqrt(np.einsum('kn,nm,km->k', weights, self.semicovariance, weights) * TRADING_DAYS)
+
+        max_drawdown = np.empty(len(weights))
+        cagr = np.empty(len(weights))
+        years = len(self._r) / TRADING_DAYS
+        for start in range(0, len(weights), self.chunk_size):
+            chunk = weights[start:start + self.chunk_size]
+            wealth = np.cumprod(1 + chunk @ self._r.T, axis=1)
+            peaks = np.maximum.accumulate(np.maximum(wealth, 1.0), axis=1)
+            max_drawdown[start:start + len(chunk)] = (1 - wealth / peaks).max(axis=1)
+            cagr[start:start + len(chunk)] = np.sign(wealth[:, -1]) * np.abs(wealth[:, -1]) ** (1 / years) - 1
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return pd.DataFrame({
+                'annual_return': annual_return,
+                'volatility': volatility,
+                'downside_deviation': downside,
+                'max_drawdown': max_drawdown,
+                'cagr': cagr,
+                'sharpe': (annual_return - self.risk_free_rate) / volatility,
+                'sortino': (annual_return - self.risk_free_rate) / downside,
+                'calmar': cagr / max_drawdown,
+            })
+
+    def frontier(self, weights, metrics, ratio, n_points=50):
+        """
+        Efficient frontier of one ratio: best return for each level of its risk measure.
+
+        :param weights: Candidate weights used for metrics
+        :param metrics: Output of evaluate(weights)
+        :param ratio: 'sharpe', 'sortino' or 'calmar'
+        :param n_points: Number of risk buckets
+        :return: DataFrame of frontier portfolios sorted by risk, with their weights
+        """
+        risk_column = RISK_MEASURES[ratio]
+        return_column = 'cagr' if ratio == 'calmar' else 'annual_return'
+        risk = metrics[risk_column].to_numpy()
+        edges = np.quantile(risk, np.linspace(0, 1, n_points + 1))
+        buckets = np.clip(np.searchsorted(edges, risk, side='right') - 1, 0, n_points - 1)
+
+        order = np.lexsort((-metrics[return_column].to_numpy(), buckets))
+        best = order[np.r_[True, buckets[order][1:] != buckets[order][:-1]]]
+        best = best[np.argsort(risk[best])]
+        # Keep only buckets that improve on the return of every less risky bucket
+        returns = metrics[return_column].to_numpy()[best]
+        best = best[returns >= np.maximum.accumulate(returns)]
+
+        table = metrics.iloc[best].reset_index(drop=True)
+        return pd.concat([table, pd.DataFrame(weights[best], columns=self.tokens)], axis=1)
+
+    def optimize(self, n_candidates=100000, min_weight=0.0, max_weight=1.0, n_points=50, seed=42):
+        """
+        Sample candidates, evaluate them and return the best portfolio and frontier per ratio.
+
+        :param n_candidates: Number of candidate weight vectors
+        :param min_weight: Lower bound per token (0 = long-only)
+        :param max_weight: Upper bound per token
+        :param n_points: Number of risk buckets per frontier
+        :param seed: Random seed
+        :return: Dict ratio -> {'best': Series of weights and metrics, 'frontier': DataFrame}
+        """
+        weights = sample_weights(len(self.tokens), n_candidates, min_weight, max_weight, seed)
+        metrics = self.evaluate(weights)
+
+        results = {}
+        for ratio in RISK_MEASURES:
+            i = int(np.nanargmax(metrics[ratio].to_numpy()))
+            best = pd.concat([metrics.iloc[i], pd.Series(weights[i], index=self.tokens)])
+            results[ratio] = {'best': best, 'frontier': self.frontier(weights, metrics, ratio, n_points)}
+        return results
+
+
+if __name__ == "__main__":
+    import time
+
+    from basket_engine import load_prices
+
+    tokens = ['AGIX', 'COPI', 'EMP', 'GENS', 'IAG', 'INDY', 'LENFI', 'MILK', 'MIN', 'NEWM',
+              'NMKR', 'NTX', 'SNEK', 'SUNDAE', 'WMT', 'WRT', 'HUNT', 'BOOK', 'FLDT', 'MELD']
+    returns = load_prices(tokens).pct_change(fill_method=None)
+
+    start = time.perf_counter()
+    optimizer = PortfolioOptimizer(returns)
+    results = optimizer.optimize(n_candidates=100000, max_weight=0.25)
+    print(f"100,000 candidates over {len(optimizer.returns)} days in {time.perf_counter() - start:.2f}s")
+
+    for ratio, result in results.items():
+        weights = result['best'][optimizer.tokens]
+        print(f"\nBest {ratio} ratio: {result['best'][ratio]:.2f}")
+        print(weights[weights > 0.01].sort_values(ascending=False).round(3).to_string())
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental risk statistics for the nightly risk job.
+
+calculate_descriptive_stats and calculate_and_plot_var recompute everything from the full price
+history on every run. RiskState keeps a small running state per series instead and is saved to
+JSON between runs, so each run only feeds the days added since the last one:
+
+* mean and variance of the daily returns with Welford's algorithm
+* the downside second moment below the daily risk-free rate for the Sortino ratio
+* the running wealth, its peak and the maximum drawdown
+* a histogram sketch of the returns for historical VaR at any confidence level
+
+Updating a series costs O(1) per new day, and current metrics are read from the state in time
+independent of the history length. The statistics cover the whole history fed so far (since the first date of each series), with the
+same formulas as calculate_descriptive_stats and equity_metrics.return_metrics.
+"""
+
+import json
+import math
+import os
+import sys
+import tempfile
+from bisect import insort
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+
+
+class QuantileSketch:
+    """
+    Streaming quantiles from a sparse histogram of log returns.
+
+    Every return is counted in a bin of fixed width in log-return space, so a quantile is off by
+    at most half a bin (0.0005 in log return for the default width) and the number of bins only
+    depends on the range of returns seen, not on the number of days. The bin keys are kept
+    sorted as they are added, so a quantile is one pass over the bins without sorting.
+
+    :param width: Bin width in log returns
+    """
+
+    def __init__(self, width=0.001):
+        self.width = width
+        self.count = 0
+        self.bins = {}
+        self.keys = []
+
+    def update(self, r):
+        # A total loss has no log return; count it in the lowest representable bin
+        key = math.floor(math.log1p(max(r, -0.9999)) / self.width)
+        if key not in self.bins:
+            self.bins[key] = 0
+            insort(self.keys, key)
+        self.bins[key] += 1
+        self.count += 1
+
+    def quantile(self, p):
+        """Quantile p: the bin holding rank p * (count - 1), the rank np.percentile interpolates at."""
+        if not self.count:
+            return math.nan
+        rank = p * (self.count - 1)
+        seen = 0
+        for key in self.keys:
+            seen += self.bins[key]
+            if seen > rank:
+                return math.expm1((key + 0.5) * self.width)
+        return math.expm1((self.keys[-1] + 0.5) * self.width)
+
+    def to_dict(self):
+        return {'width': self.width, 'count': self.count, 'bins': {str(key): n for key, n in self.bins.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['width'])
+        sketch.count = data['count']
+        sketch.bins = {int(key): n for key, n in data['bins'].items()}
+        sketch.keys = sorted(sketch.bins)
+        return sketch
+
+
+class SeriesRiskState:
+    """
+    Running risk state of one price series.
+
+    :param risk_free_rate: Annual risk-free rate (default 5%)
+    :param confidence_levels: Confidence levels for VaR
+    """
+
+    _FIELDS = ('count', 'mean', 'm2', 'downside_m2', 'wealth', 'peak', 'max_drawdown', 'days_under_water',
+               'last_date', 'last_price')
+
+    def __init__(self, risk_free_rate=0.05, confidence_levels=(0.95,)):
+        self.risk_free_rate = risk_free_rate
+        self.confidence_levels = tuple(confidence_levels)
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.downside_m2 = 0.0
+        self.wealth = 1.0
+        self.peak = 1.0
+        self.max_drawdown = 0.0
+        self.days_under_water = 0
+        self.last_date = None
+        self.last_price = None
+        self.sketch = QuantileSketch()
+
+    def update_price(self, date, price):
+        """
+        Add one closing price; the return is taken against the last valid price.
+
+        Prices at or before the last seen date are ignored, so overlapping history can be fed again.
+        """
+        date = pd.Timestamp(date).isoformat()
+        if self.last_date is not None and date <= self.last_date:
+            return
+        if price is None or not np.isfinite(price):
+            return
+        if self.last_price is not None:
+            self.update_return(price / self.last_price - 1)
+        self.last_date = date
+        self.last_price = float(price)
+
+    def update_return(self, r):
+        """Add one daily simple return."""
+        self.count += 1
+        delta = r - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (r - self.mean)
+        self.downside_m2 += min(r - self.risk_free_rate / TRADING_DAYS, 0.0) ** 2
+
+        self.wealth *= 1 + r
+        self.peak = max(self.peak, self.wealth)
+        drawdown = 1 - self.wealth / self.peak
+        self.max_drawdown = max(self.max_drawdown, drawdown)
+        self.days_under_water += drawdown > 0
+
+        self.sketch.update(r)
+
+    def metrics(self):
+        """Current metrics, named as in calculate_descriptive_stats."""
+        std = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+        annual_return = (1 + self.mean) ** TRADING_DAYS - 1 if self.count else math.nan
+        annual_volatility = std * math.sqrt(TRADING_DAYS)
+        downside = math.sqrt(self.downside_m2 / self.count * TRADING_DAYS) if self.count else math.nan
+        years = self.count / TRADING_DAYS
+        cagr = self.wealth ** (1 / years) - 1 if self.count else math.nan
+
+        def ratio(numerator, denominator):
+            return numerator / denominator if denominator else math.nan
+
+        result = {
+            'Days': self.count,
+            'Standard Deviation': std,
+            'Annualized Volatility': annual_volatility,
+            'Annualized Return': annual_return,
+            'Sharpe Ratio': ratio(annual_return - self.risk_free_rate, annual_volatility),
+            'Sortino Ratio': ratio(annual_return - self.risk_free_rate, downside),
+            'Max Drawdown': self.max_drawdown,
+            'Current Drawdown': 1 - self.wealth / self.peak,
+            'Calmar Ratio': ratio(cagr, self.max_drawdown),
+            'Time Under Water': ratio(self.days_under_water, self.count),
+        }
+        for level in self.confidence_levels:
+            result[f'VaR ({level*100}%)'] = self.sketch.quantile(1 - level)
+        return result
+
+    def to_dict(self):
+        data = {field: getattr(self, field) for field in self._FIELDS}
+        data['risk_free_rate'] = self.risk_free_rate
+        data['confidence_levels'] = list(self.confidence_levels)
+        data['sketch'] = self.sketch.to_dict()
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(data['risk_free_rate'], data['confidence_levels'])
+        for field in cls._FIELDS:
+            setattr(state, field, data[field])
+        state.sketch = QuantileSketch.from_dict(data['sketch'])
+        return state
+
+
+class RiskState:
+    """
+    Risk states of many series, persisted as one JSON file.
+
+    :param path: JSON file of the state (created on the first save)
+    :param risk_free_rate: Annual risk-free rate for new series
+    :param confidence_levels: VaR confidence levels for new series
+    """
+
+    def __init__(self, path, risk_free_rate=0.05, confidence_levels=(0.95,)):
+        self.path = path
+        self.risk_free_rate = risk_free_rate
+        self.confidence_levels = tuple(confidence_levels)
+        self.series = {}
+
+    @classmethod
+    def load(cls, path, risk_free_rate=0.05, confidence_levels=(0.95,)):
+        """Load the state saved at path, or start an empty one if the file does not exist."""
+        state = cls(path, risk_free_rate, confidence_levels)
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            state.series = {name: SeriesRiskState.from_dict(series) for name, series in data.items()}
+        return state
+
+    def save(self):
+        # Write to a temporary file first so an interrupted run never leaves a truncated state
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump({name: series.to_dict() for name, series in self.series.items()}, f)
+        os.replace(temporary, self.path)
+
+    def update(self, prices):
+        """
+        Feed new prices; rows at or before each series' last date are skipped.
+
+        :param prices: DataFrame of prices, date x series (e.g. tokens or basket values)
+        :return: Number of new days added per series
+        """
+        added = {}
+        for name in prices.columns:
+            if name not in self.series:
+                self.series[name] = SeriesRiskState(self.risk_free_rate, self.confidence_levels)
+            state = self.series[name]
+            column = prices[name].dropna()
+            if state.last_date is not None:
+                column = column[column.index > pd.Timestamp(state.last_date)]
+            before = state.count
+            for date, price in column.items():
+                state.update_price(date, price)
+            added[name] = state.count - before
+        return added
+
+    def metrics(self):
+        """Current metrics of every series as a DataFrame."""
+        return pd.DataFrame({name: series.metrics() for name, series in self.series.items()}).T
+
+
+if __name__ == "__main__":
+    import time
+
+    from basket_engine import load_prices
+
+    # Usage: python risk_state.py [state.json] - the demo state goes to the temp folder, not the repository
+    tokens = ['MIN', 'MILK', 'GENS', 'SUNDAE', 'WRT']
+    prices = load_prices(tokens)
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(tempfile.gettempdir(), 'dataportal_risk_state.json')
+
+    start = time.perf_counter()
+    state = RiskState.load(path)
+    added = state.update(prices)
+    state.save()
+    print(f"Added {sum(added.values())} new days in {time.perf_counter() - start:.3f}s")
+    print(state.metrics().round(4).to_string())
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Rolling covariance and correlation matrices for all token pairs.
+
+Computing every pair with Series.rolling(window).corr costs O(N^2 * window) per bar. Both
+functions here work from running sums instead: per pair the count of days where both tokens
+traded, the sums and sums of squares of each token over those days, and the sum of cross
+products. Adding a new bar and dropping the oldest one updates all N x N sums in O(N^2).
+
+Tokens list on different dates, so missing values are handled pairwise like pandas: a pair
+only uses the days on which both tokens have a return.
+
+* rolling_correlation - batch over a whole history with cumulative sums
+* RollingCovariance - streaming updater for one new bar at a time
+"""
+
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+def _pair_sums(values):
+    # Per-bar contributions to the pairwise sums, each of shape (T, N, N)
+    mask = ~np.isnan(values)
+    x = np.where(mask, values, 0.0)
+    m = mask.astype(float)
+    count = m[:, :, None] * m[:, None, :]
+    sum_x = x[:, :, None] * m[:, None, :]
+    sum_xx = (x * x)[:, :, None] * m[:, None, :]
+    sum_xy = x[:, :, None] * x[:, None, :]
+    return count, sum_x, sum_xx, sum_xy
+
+
+def _moments(count, sum_x, sum_xx, sum_xy, min_periods):
+    # Covariance and correlation from pairwise sums; entry [i, j] of sum_x sums x_i over days where j also traded
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sum_y = np.swapaxes(sum_x, -1, -2)
+        sum_yy = np.swapaxes(sum_xx, -1, -2)
+        cov = (sum_xy - sum_x * sum_y / count) / (count - 1)
+        var_x = (sum_xx - sum_x * sum_x / count) / (count - 1)
+        var_y = (sum_yy - sum_y * sum_y / count) / (count - 1)
+        corr = cov / np.sqrt(var_x * var_y)
+    invalid = count < max(min_periods, 2)
+    cov[invalid] = np.nan
+    corr[invalid] = np.nan
+    return cov, np.clip(corr, -1, 1)
+
+
+def rolling_correlation(returns, window, min_periods=None, covariance=False):
+    """
+    Rolling correlation (or covariance) matrix for every date of a history.
+
+    :param returns: DataFrame of returns, date x token
+    :param window: Rolling window length in bars
+    :param min_periods: Minimum number of common observations per pair (default: window)
+    :param covariance: Return covariances instead of correlations
+    :return: Array of shape (T, N, N); entry [t, i, j] uses the window ending at row t
+    """
+    min_periods = window if min_periods is None else min_periods
+    values = returns.to_numpy(dtype=float)
+
+    sums = []
+    for total in _pair_sums(values):
+        cumulative = np.cumsum(total, axis=0)
+        # Window sum = cumulative sum now minus cumulative sum window bars ago
+        cumulative[window:] = cumulative[window:] - cumulative[:-window]
+        sums.append(cumulative)
+
+    cov, corr = _moments(*sums, min_periods)
+    return cov if covariance else corr
+
+
+def correlation_frame(matrices, returns, date):
+    """Pick the matrix for one date out of rolling_correlation output as a labelled DataFrame."""
+    row = returns.index.get_loc(pd.Timestamp(date))
+    return pd.DataFrame(matrices[row], index=returns.columns, columns=returns.columns)
+
+
+class RollingCovariance:
+    """
+    Streaming rolling covariance and correlation matrices.
+
+    :param tokens: Token names in the order of the values passed to update
+    :param window: Rolling window length in bars
+    :param min_periods: Minimum number of common observations per pair (default: window)
+    """
+
+    def __init__(self, tokens, window, min_periods=None):
+        self.tokens = list(tokens)
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        n = len(self.tokens)
+        self._bars = deque()
+        self._sums = [np.zeros((n, n)) for _ in range(4)]
+
+    @classmethod
+    def from_history(cls, returns, window, min_periods=None):
+        """Create an updater and feed it the last window rows of a returns DataFrame."""
+        updater = cls(returns.columns, window, min_periods)
+        for row in returns.to_numpy(dtype=float)[-window:]:
+            updater.update(row)
+        return updater
+
+    def update(self, values):
+        """
+        Add one bar of returns and drop the oldest bar once the window is full.
+
+        :param values: Sequence of returns in token order, or a dict/Series keyed by token; NaN for missing
+        """
+        if isinstance(values, (dict, pd.Series)):
+            values = [values.get(token, np.nan) for token in self.tokens]
+        bar = [s[0] for s in _pair_sums(np.asarray(values, dtype=float)[None, :])]
+        self._bars.append(bar)
+        for total, contribution in zip(self._sums, bar):
+            total += contribution
+        if len(self._bars) > self.window:
+            for total, contribution in zip(self._sums, self._bars.popleft()):
+                total -= contribution
+
+    def covariance(self):
+        cov, _ = _moments(*self._sums, self.min_periods)
+        return pd.DataFrame(cov, index=self.tokens, columns=self.tokens)
+
+    def correlation(self):
+        _, corr = _moments(*self._sums, self.min_periods)
+        return pd.DataFrame(corr, index=self.tokens, columns=self.tokens)
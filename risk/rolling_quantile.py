@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Rolling quantiles for many series and confidence levels at once.
+
+calculate_and_plot_var used to compute rolling VaR with
+rolling(window).apply(lambda x: calculate_var(x, confidence_level)), which calls
+np.percentile from Python once per window, per basket and per confidence level.
+Here every quantile level is one call of the sliding-window quantile built into pandas
+(rolling().quantile), which keeps each window sorted in compiled code and covers all
+columns of the frame in one pass. Results match np.percentile with linear interpolation.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def rolling_quantiles(values, window, quantiles):
+    """
+    Rolling quantiles for one or many series at several levels.
+
+    Windows that are not yet full or that contain NaN give NaN, like pandas rolling().apply.
+
+    :param values: Array of shape (T,) or (T, N) with one series per column
+    :param window: Number of observations per window
+    :param quantiles: Sequence of quantile levels in [0, 1]
+    :return: Array of shape (T, Q) for 1D input or (T, N, Q) for 2D input
+    """
+    values = np.asarray(values, dtype=float)
+    squeeze = values.ndim == 1
+    rolling = pd.DataFrame(values[:, None] if squeeze else values).rolling(window)
+    out = np.stack([rolling.quantile(float(q), interpolation='linear').to_numpy() for q in quantiles], axis=-1)
+    return out[:, 0, :] if squeeze else out
+
+
+def rolling_var(returns, window=20, confidence_levels=(0.95,)):
+    """
+    Rolling historical Value at Risk for every column of a returns DataFrame.
+
+    :param returns: DataFrame of periodic returns, one column per basket or token
+    :param window: Rolling window length (default 20)
+    :param confidence_levels: One or more confidence levels (default 0.95)
+    :return: DataFrame with the same index and a column per (series, confidence level);
+             with a single confidence level the columns are the series names
+    """
+    levels = [confidence_levels] if np.isscalar(confidence_levels) else list(confidence_levels)
+    rolling = returns.rolling(window)
+    quantiles = [rolling.quantile(1 - level, interpolation='linear') for level in levels]
+    if len(levels) == 1:
+        return quantiles[0]
+    result = pd.concat(quantiles, axis=1, keys=levels, names=['confidence_level', 'series'])
+    return result.swaplevel(axis=1)[pd.MultiIndex.from_product([returns.columns, levels],
+                                                               names=['series', 'confidence_level'])]
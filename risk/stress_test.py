@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Scenario and rug-pull stress tests for token baskets.
+
+A scenario is a path of shocks of shape (steps, tokens): the simple return added to every token
+at every step. Three generators cover the cases discussed in the "Rug-pulls" section of risk.md:
+
+* rug_pull_scenarios - one token gaps down (by default -95%) in a single step
+* liquidity_drain_scenarios - a "salami rug pull": the same total loss spread over several steps
+* sector_drawdown_scenarios - all tokens of a sector fall together, the rest of the market follows
+  with a smaller spillover move
+
+Every scenario is applied to every basket and, to see it in different market conditions, on top
+of every historical window of the token returns. The scenario path starts with the window and
+runs step by step alongside the market, one step per day. With the cumulative scenario factors
+of a day as a (scenario x token) matrix, the token growth since the window start as a
+(window x token) matrix and the basket weights as a (basket x token) matrix, the basket values of
+all scenario x basket x window combinations on that day are one einsum. The values of the last
+day give a loss distribution (worst, VaR, CVaR, median) per scenario and basket, the running
+peak of the daily values the drawdown within the windows.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def basket_weight_matrix(baskets, tokens):
+    """
+    Normalized weights of several baskets over one token list.
+
+    :param baskets: Dict basket name -> list of tokens (equal weight) or dict token -> weight
+    :param tokens: Token order of the columns
+    :return: Array of shape (baskets, tokens) with rows summing to one
+    """
+    weights = np.zeros((len(baskets), len(tokens)))
+    for b, members in enumerate(baskets.values()):
+        if not isinstance(members, dict):
+            members = {token: 1.0 for token in members}
+        for token, weight in members.items():
+            weights[b, tokens.index(token)] = weight
+    return weights / weights.sum(axis=1, keepdims=True)
+
+
+def rug_pull_scenarios(tokens, gap=-0.95):
+    """
+    One scenario per token in which only that token gaps down in a single step.
+
+    :param tokens: Token list
+    :param gap: Simple return of the gap (default -95%)
+    :return: (names, shocks) with shocks of shape (len(tokens), 1, len(tokens))
+    """
+    shocks = np.zeros((len(tokens), 1, len(tokens)))
+    shocks[np.arange(len(tokens)), 0, np.arange(len(tokens))] = gap
+    return [f"Rug pull {token}" for token in tokens], shocks
+
+
+def liquidity_drain_scenarios(tokens, total_loss=-0.9, steps=10):
+    """
+    One scenario per token in which it loses total_loss over several equal steps.
+
+    :param tokens: Token list
+    :param total_loss: Simple return over the whole drain (default -90%)
+    :param steps: Number of steps, e.g. days
+    :return: (names, shocks) with shocks of shape (len(tokens), steps, len(tokens))
+    """
+    step = (1 + total_loss) ** (1 / steps) - 1
+    shocks = np.zeros((len(tokens), steps, len(tokens)))
+    shocks[np.arange(len(tokens)), :, np.arange(len(tokens))] = step
+    return [f"Liquidity drain {token} ({steps} steps)" for token in tokens], shocks
+
+
+def sector_drawdown_scenarios(tokens, sectors, drawdowns=(-0.3, -0.5, -0.7), spillover=0.3, steps=1):
+    """
+    Correlated drawdowns of whole sectors.
+
+    :param tokens: Token list
+    :param sectors: Dict sector name -> list of tokens
+    :param drawdowns: Simple return of the sector tokens, one scenario per value and sector
+    :param spillover: Fraction of the drawdown suffered by the tokens outside the sector
+    :param steps: Number of equal steps over which the drawdown happens
+    :return: (names, shocks) with shocks of shape (len(sectors) * len(drawdowns), steps, len(tokens))
+    """
+    names = []
+    shocks = np.zeros((len(sectors) * len(drawdowns), steps, len(tokens)))
+    s = 0
+    for sector, members in sectors.items():
+        in_sector = np.isin(tokens, members)
+        for drawdown in drawdowns:
+            total = np.where(in_sector, drawdown, spillover * drawdown)
+            shocks[s] = (1 + total) ** (1 / steps) - 1
+            names.append(f"{sector} drawdown {drawdown:.0%}")
+            s += 1
+    return names, shocks
+
+
+def combine_scenarios(*scenario_sets):
+    """Stack several (names, shocks) sets into one, padding shorter paths with zero shocks."""
+    steps = max(shocks.shape[1] for _, shocks in scenario_sets)
+    names = [name for set_names, _ in scenario_sets for name in set_names]
+    padded = [np.pad(shocks, ((0, 0), (0, steps - shocks.shape[1]), (0, 0))) for _, shocks in scenario_sets]
+    return names, np.concatenate(padded)
+
+
+def window_growth(returns, window):
+    """
+    Growth factor of every token over every rolling window of the history.
+
+    :param returns: DataFrame of daily simple returns, date x token
+    :param window: Window length in days
+    :return: Array of shape (windows, tokens); NaN where a token has a missing return in the window
+    """
+    values = returns.to_numpy(dtype=float)
+    missing = np.isnan(values)
+    log_growth = np.vstack([np.zeros(values.shape[1]), np.cumsum(np.where(missing, 0.0, np.log1p(values)), axis=0)])
+    n_missing = np.vstack([np.zeros(values.shape[1]), np.cumsum(missing, axis=0)])
+    growth = np.exp(log_growth[window:] - log_growth[:-window])
+    return np.where(n_missing[window:] - n_missing[:-window] > 0, np.nan, growth)
+
+
+def window_growth_path(returns, window):
+    """
+    Growth factor of every token from the start of every rolling window to the end of each of its days.
+
+    :param returns: DataFrame of daily simple returns, date x token
+    :param window: Window length in days
+    :return: Array of shape (window, windows, tokens); the last day equals window_growth.
+        Missing returns count as zero, use window_growth to find the windows with gaps.
+    """
+    values = returns.to_numpy(dtype=float)
+    log_growth = np.vstack([np.zeros(values.shape[1]), np.cumsum(np.nan_to_num(np.log1p(values)), axis=0)])
+    n_windows = len(values) - window + 1
+    return np.exp(np.stack([log_growth[day:day + n_windows] - log_growth[:n_windows]
+                            for day in range(1, window + 1)]))
+
+
+def _loss_distribution(outcomes, valid, confidence_level):
+    # outcomes (S, B, W) with invalid windows set to +inf so they sort last; valid (B, W)
+    n_valid = valid.sum(axis=1)
+    ordered = np.sort(outcomes, axis=-1)
+    k = np.maximum(np.floor(n_valid * (1 - confidence_level)).astype(int), 1)
+    median_index = np.maximum(n_valid // 2, 0)
+
+    finite = np.where(np.isfinite(ordered), ordered, 0.0)
+    tail_sum = np.take_along_axis(np.cumsum(finite, axis=-1), (k - 1)[None, :, None], axis=-1)[..., 0]
+    with np.errstate(invalid='ignore'):
+        result = {
+            'Worst Return': ordered[..., 0],
+            f'VaR ({confidence_level*100}%)': np.take_along_axis(ordered, (k - 1)[None, :, None], axis=-1)[..., 0],
+            f'CVaR ({confidence_level*100}%)': tail_sum / k,
+            'Median Return': np.take_along_axis(ordered, median_index[None, :, None], axis=-1)[..., 0],
+            'Mean Return': np.where(valid, outcomes, 0.0).sum(axis=-1) / n_valid,
+        }
+    no_history = n_valid == 0
+    for values in result.values():
+        values[:, no_history] = np.nan
+    return result
+
+
+def _drawdown_distribution(drawdowns, valid):
+    # drawdowns (S, B, W) of the windows, largest first; valid (B, W)
+    n_valid = valid.sum(axis=1)
+    ordered = -np.sort(np.where(valid[None], -drawdowns, np.inf), axis=-1)
+    median_index = np.maximum(n_valid // 2, 0)
+    result = {
+        'Worst Max Drawdown': ordered[..., 0],
+        'Median Max Drawdown': np.take_along_axis(ordered, median_index[None, :, None], axis=-1)[..., 0],
+    }
+    for values in result.values():
+        values[:, n_valid == 0] = np.nan
+    return result
+
+
+def stress_test(returns, baskets, scenarios, window=20, confidence_level=0.95, initial_investment=None,
+                chunk_size=1000):
+    """
+    Loss distribution of every scenario x basket combination over the historical windows.
+
+    The basket is bought at the start of each window and held. Step k of the scenario hits the
+    tokens at the end of day k together with the market move of that day, so a drain over ten
+    steps is spread over the first ten days while a gap hits on the first. The return is the
+    basket return over the whole window, the max drawdown is measured on the daily basket values.
+    A window shorter than the scenario only sees its first window steps.
+
+    :param returns: DataFrame of daily simple returns, date x token
+    :param baskets: Dict basket name -> list of tokens or dict token -> weight
+    :param scenarios: (names, shocks) from the generators or combine_scenarios; shocks use the token order of returns
+    :param window: Historical window length in days
+    :param confidence_level: Confidence level for VaR and CVaR over the windows
+    :param initial_investment: If given, also report the worst case and VaR in ADA for this position size
+    :param chunk_size: Baskets evaluated per chunk, bounding memory at scenarios x chunk_size x windows
+    :return: DataFrame indexed by (scenario, basket); Scenario Return and Scenario Max Drawdown
+        are the scenario path alone, without any market move
+    """
+    names, shocks = scenarios
+    tokens = list(returns.columns)
+    weights = basket_weight_matrix(baskets, tokens)
+    growth = window_growth(returns, window)
+    growth_path = window_growth_path(returns, window)
+    held = weights > 0
+
+    # Scenario-only outcome and path drawdown, without any market move
+    path = np.cumprod(1 + shocks, axis=1)
+    path_values = np.einsum('shn,bn->sbh', path, weights)
+    scenario_return = path_values[..., -1] - 1
+    peaks = np.maximum.accumulate(np.maximum(path_values, 1.0), axis=-1)
+    scenario_drawdown = (1 - path_values / peaks).max(axis=-1)
+
+    metrics = {}
+    for start in range(0, len(weights), chunk_size):
+        chunk = weights[start:start + chunk_size]
+        valid = (held[start:start + chunk_size].astype(int) @ np.isnan(growth).T.astype(int)) == 0
+        # Walk through the days of all windows at once, keeping the running peak of the basket value
+        peak = drawdown = None
+        for day in range(window):
+            factor = path[:, min(day, path.shape[1] - 1), :]
+            values = np.einsum('bn,wn,sn->sbw', chunk, growth_path[day], factor)
+            peak = np.maximum(values, 1.0) if peak is None else np.maximum(peak, values)
+            day_drawdown = 1 - values / peak
+            drawdown = day_drawdown if drawdown is None else np.maximum(drawdown, day_drawdown)
+        outcomes = np.where(valid[None], values - 1, np.inf)
+        for name, values in _loss_distribution(outcomes, valid, confidence_level).items():
+            metrics.setdefault(name, []).append(values)
+        for name, values in _drawdown_distribution(drawdown, valid).items():
+            metrics.setdefault(name, []).append(values)
+
+    index = pd.MultiIndex.from_product([names, list(baskets)], names=['scenario', 'basket'])
+    table = pd.DataFrame({'Scenario Return': scenario_return.ravel(),
+                          'Scenario Max Drawdown': scenario_drawdown.ravel()}, index=index)
+    for name, parts in metrics.items():
+        table[name] = np.concatenate(parts, axis=1).ravel()
+    if initial_investment is not None:
+        for name in ('Worst Return', f'VaR ({confidence_level*100}%)'):
+            table[f'{name} (ADA)'] = table[name] * initial_investment
+    return table
+
+
+def worst_cases(table, n=10, by='Worst Return'):
+    """The n scenario x basket combinations with the largest losses."""
+    return table.sort_values(by).head(n)
+
+
+if __name__ == "__main__":
+    import time
+
+    from basket_engine import load_prices
+
+    tokens = ['MIN', 'MILK', 'GENS', 'SUNDAE', 'WRT', 'INDY', 'LENFI', 'SNEK']
+    returns = load_prices(tokens).pct_change(fill_method=None)
+    baskets = {
+        'DEX': ['MIN', 'MILK', 'GENS', 'SUNDAE', 'WRT'],
+        'DeFi': ['MIN', 'SUNDAE', 'INDY', 'LENFI'],
+        'DEX + meme': {'MIN': 0.4, 'SUNDAE': 0.3, 'SNEK': 0.3},
+    }
+    sectors = {'DEX': ['MIN', 'MILK', 'GENS', 'SUNDAE', 'WRT'], 'Lending': ['INDY', 'LENFI']}
+    scenarios = combine_scenarios(
+        rug_pull_scenarios(tokens),
+        liquidity_drain_scenarios(tokens, total_loss=-0.9, steps=10),
+        sector_drawdown_scenarios(tokens, sectors),
+    )
+
+    start = time.perf_counter()
+    table = stress_test(returns, baskets, scenarios, window=20, initial_investment=100000)
+    print(f"{len(table)} scenario x basket combinations in {time.perf_counter() - start:.2f}s")
+    print(worst_cases(table).round(4).to_string())
@@ -1,119 +1,281 @@
-# -*- coding: utf-8 -*-
-import pandas as pd
-import numpy as np
-from dateutil.parser import parse
-import matplotlib.pyplot as plt
-
-def analyze_csv(file_path):
-    # Read the CSV file
-    df = pd.read_csv(file_path, parse_dates=['date'])
-
-    print("Data Quality Analysis Report")
-    print("===========================\n")
-
-    # Print column names
-    print("Column Names:")
-    print(df.columns.tolist())
-    print()
-
-    # Analyze date format
-    date_col = df['date']
-    date_formats = date_col.apply(lambda x: x.strftime('%Y-%m-%d')).unique()
-    print(f"Date Format: {date_formats[0]}")
-    print(f"Date Range: {date_col.min()} to {date_col.max()}")
-    print()
-
-    # Percentage of NaN values in each column
-    print("Percentage of NaN values in each column:")
-    nan_percentages = df.isnull().mean() * 100
-    for col, percentage in nan_percentages.items():
-        print(f"{col}: {percentage:.2f}%")
-    print()
-
-    # High and low values for numeric columns
-    numeric_cols = df.select_dtypes(include=[np.number]).columns
-    print("High and Low values for numeric columns:")
-    for col in numeric_cols:
-        print(f"{col}:")
-        print(f"  High: {df[col].max():.6f}")
-        print(f"  Low: {df[col].min():.6f}")
-    print()
-
-    # Basic statistics
-    print("Basic statistics for numeric columns:")
-    print(df.describe())
-    print()
-
-    # Check for duplicates
-    duplicates = df.duplicated().sum()
-    print(f"Number of duplicate rows: {duplicates}")
-    print()
-
-    # Check for outliers using IQR method
-    print("Potential outliers (using IQR method):")
-    outliers_report = {}
-    for col in numeric_cols:
-        Q1 = df[col].quantile(0.25)
-        Q3 = df[col].quantile(0.75)
-        IQR = Q3 - Q1
-        lower_bound = Q1 - 1.5 * IQR
-        upper_bound = Q3 + 1.5 * IQR
-        outliers = df[(df[col] < lower_bound) | (df[col] > upper_bound)]
-        print(f"{col}: {len(outliers)} potential outliers")
-        outliers_report[col] = {'count': len(outliers), 'data': outliers}
-    print()
-
-    # Analyze trading volume
-    print("Trading Volume Analysis:")
-    print(f"Average Daily Volume: {df['volume'].mean():.2f}")
-    print(f"Highest Volume Day: {df.loc[df['volume'].idxmax(), 'date']} ({df['volume'].max():.2f})")
-    print(f"Lowest Volume Day: {df.loc[df['volume'].idxmin(), 'date']} ({df['volume'].min():.2f})")
-    print()
-
-    # Calculate daily returns
-    df['daily_return'] = df['close'].pct_change()
-
-    # Calculate volatility (standard deviation of returns)
-    volatility = df['daily_return'].std() * np.sqrt(252)  # Annualized volatility
-    print(f"Annualized Volatility: {volatility:.2%}")
-
-    # Plot price and volume
-    plt.figure(figsize=(12, 6))
-    plt.subplot(2, 1, 1)
-    plt.plot(df['date'], df['close'])
-    plt.title('Price History')
-    plt.ylabel('Price')
-
-    plt.subplot(2, 1, 2)
-    plt.bar(df['date'], df['volume'])
-    plt.title('Volume History')
-    plt.ylabel('Volume')
-
-    plt.tight_layout()
-    plt.savefig('price_volume_history.png')
-    plt.close()
-
-    print("\nA plot of price and volume history has been saved as 'price_volume_history.png'")
-
-    # Detailed outlier report
-    print("\nDetailed Outlier Report:")
-    for col, data in outliers_report.items():
-        print(f"\n{col}:")
-        if data['count'] <= 6:
-            print("Outlier dates:")
-            for _, row in data['data'].iterrows():
-                print(f"  {row['date']}: {row[col]:.6f}")
-        else:
-            # Perform 3 * IQR analysis for columns with more than 6 outliers
-            Q1 = df[col].quantile(0.25)
-            Q3 = df[col].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 3 * IQR
-            upper_bound = Q3 + 3 * IQR
-            extreme_outliers = df[(df[col] < lower_bound) | (df[col] > upper_bound)]
-            print(f"Extreme outliers (3 * IQR method):")
-            for _, row in extreme_outliers.iterrows():
-                print(f"  {row['date']}: {row[col]:.6f}")
-
-# Call the function with our CSV file path
-analyze_csv('WRT.csv')
\ No newline at end of file
+# -*- coding: utf-8 -*-
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import pandas as pd
+import numpy as np
+import matplotlib.pyplot as plt
+
+def column_stats(dates, values):
+    """
+    Compute all quality statistics for one numeric column in a single vectorized pass.
+
+    The quartiles are taken once and reused for both the 1.5 * IQR and the 3 * IQR
+    outlier bands, and outlier dates are selected with boolean masks instead of iterrows.
+
+    :param dates: Array of datetime64 values aligned with values
+    :param values: Array of float values for the column
+    :return: Dictionary with NaN share, range, moments, quartiles and outlier dates
+    """
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    count = int(valid.sum())
+    stats = {
+        'count': count,
+        'nan_pct': float(100 * (1 - count / len(values))) if len(values) else 0.0,
+    }
+    if count == 0:
+        # All-NaN column: same keys as any other column, so the report prints nan instead of failing
+        stats.update({key: float('nan') for key in ('min', 'max', 'mean', 'q1', 'median', 'q3')})
+        stats.update({'std': None, 'outliers': 0, 'extreme_outliers': 0,
+                      'outlier_dates': [], 'extreme_outlier_dates': []})
+        return stats
+
+    q1, median, q3 = np.nanpercentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    stats.update({
+        'min': float(np.nanmin(values)),
+        'max': float(np.nanmax(values)),
+        'mean': float(np.nanmean(values)),
+        'std': float(np.nanstd(values, ddof=1)) if count > 1 else None,
+        'q1': float(q1),
+        'median': float(median),
+        'q3': float(q3),
+    })
+
+    # Comparisons against NaN are False, so missing values never count as outliers
+    outliers = (values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)
+    extreme = (values < q1 - 3 * iqr) | (values > q3 + 3 * iqr)
+    stats['outliers'] = int(outliers.sum())
+    stats['extreme_outliers'] = int(extreme.sum())
+    stats['outlier_dates'] = _format_dates(dates[outliers])
+    stats['extreme_outlier_dates'] = _format_dates(dates[extreme])
+    return stats
+
+def _format_dates(dates):
+    return [str(d)[:10] for d in np.asarray(dates, dtype='datetime64[D]')]
+
+def plot_price_volume(df, output_path='price_volume_history.png'):
+    # Plot price and volume
+    plt.figure(figsize=(12, 6))
+    plt.subplot(2, 1, 1)
+    plt.plot(df['date'], df['close'])
+    plt.title('Price History')
+    plt.ylabel('Price')
+
+    plt.subplot(2, 1, 2)
+    plt.bar(df['date'], df['volume'])
+    plt.title('Volume History')
+    plt.ylabel('Volume')
+
+    plt.tight_layout()
+    plt.savefig(output_path)
+    plt.close()
+
+def analyze_csv(file_path):
+    # Read the CSV file
+    df = pd.read_csv(file_path, parse_dates=['date'])
+
+    print("Data Quality Analysis Report")
+    print("===========================\n")
+
+    # Print column names
+    print("Column Names:")
+    print(df.columns.tolist())
+    print()
+
+    # Analyze date format
+    date_col = df['date']
+    print(f"Date Format: {date_col.iloc[0].strftime('%Y-%m-%d')}")
+    print(f"Date Range: {date_col.min()} to {date_col.max()}")
+    print()
+
+    # Percentage of NaN values in each column
+    print("Percentage of NaN values in each column:")
+    nan_percentages = df.isnull().mean() * 100
+    for col, percentage in nan_percentages.items():
+        print(f"{col}: {percentage:.2f}%")
+    print()
+
+    # Quartiles and outlier masks are computed once per column and reused below
+    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    dates = date_col.to_numpy()
+    column_report = {col: column_stats(dates, df[col].to_numpy()) for col in numeric_cols}
+
+    # High and low values for numeric columns
+    print("High and Low values for numeric columns:")
+    for col in numeric_cols:
+        print(f"{col}:")
+        print(f"  High: {column_report[col]['max']:.6f}")
+        print(f"  Low: {column_report[col]['min']:.6f}")
+    print()
+
+    # Basic statistics
+    print("Basic statistics for numeric columns:")
+    print(df.describe())
+    print()
+
+    # Check for duplicates
+    duplicates = df.duplicated().sum()
+    print(f"Number of duplicate rows: {duplicates}")
+    print()
+
+    # Check for outliers using IQR method
+    print("Potential outliers (using IQR method):")
+    for col in numeric_cols:
+        print(f"{col}: {column_report[col]['outliers']} potential outliers")
+    print()
+
+    # Analyze trading volume
+    print("Trading Volume Analysis:")
+    print(f"Average Daily Volume: {df['volume'].mean():.2f}")
+    print(f"Highest Volume Day: {df.loc[df['volume'].idxmax(), 'date']} ({df['volume'].max():.2f})")
+    print(f"Lowest Volume Day: {df.loc[df['volume'].idxmin(), 'date']} ({df['volume'].min():.2f})")
+    print()
+
+    # Calculate daily returns
+    df['daily_return'] = df['close'].pct_change()
+
+    # Calculate volatility (standard deviation of returns)
+    volatility = df['daily_return'].std() * np.sqrt(252)  # Annualized volatility
+    print(f"Annualized Volatility: {volatility:.2%}")
+
+    plot_price_volume(df)
+    print("\nA plot of price and volume history has been saved as 'price_volume_history.png'")
+
+    # Detailed outlier report
+    print("\nDetailed Outlier Report:")
+    for col in numeric_cols:
+        values = df[col].to_numpy()
+        stats = column_report[col]
+        print(f"\n{col}:")
+        if stats['outliers'] <= 6:
+            print("Outlier dates:")
+            q1, q3 = stats['q1'], stats['q3']
+            mask = (values < q1 - 1.5 * (q3 - q1)) | (values > q3 + 1.5 * (q3 - q1))
+        else:
+            # Use the 3 * IQR band for columns with more than 6 outliers
+            print(f"Extreme outliers (3 * IQR method):")
+            q1, q3 = stats['q1'], stats['q3']
+            mask = (values < q1 - 3 * (q3 - q1)) | (values > q3 + 3 * (q3 - q1))
+        for date, value in zip(dates[mask], values[mask]):
+            print(f"  {pd.Timestamp(date)}: {value:.6f}")
+
+def scan_file(file_path, plot_dir=None):
+    """
+    Build the quality report for one token CSV without printing.
+
+    :param file_path: Path to a token CSV with date, open, high, low, close, volume columns
+    :param plot_dir: Directory for the price/volume PNG, or None to skip plotting
+    :return: Dictionary report for the token
+    """
+    # thousands=',' also covers exports with quoted "333,540" volumes
+    df = pd.read_csv(file_path, thousands=',')
+    df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d')
+    dates = df['date'].to_numpy()
+
+    report = {
+        'file': os.path.basename(file_path),
+        'rows': int(len(df)),
+        'columns': df.columns.tolist(),
+        'duplicate_rows': int(df.duplicated().sum()),
+        'duplicate_dates': int(df['date'].duplicated().sum()),
+        'date_sorted': bool(df['date'].is_monotonic_increasing),
+    }
+    if len(df):
+        expected_days = (df['date'].max() - df['date'].min()).days + 1
+        report['date_start'] = str(df['date'].min().date())
+        report['date_end'] = str(df['date'].max().date())
+        report['missing_days'] = int(expected_days - df['date'].nunique())
+
+    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    report['column_stats'] = {col: column_stats(dates, df[col].to_numpy()) for col in numeric_cols}
+
+    # OHLC consistency: high must be the highest and low the lowest of the four prices
+    if all(col in df.columns for col in ['open', 'high', 'low', 'close']):
+        prices = df[['open', 'high', 'low', 'close']].to_numpy()
+        bad_high = df['high'].to_numpy() < prices.max(axis=1)
+        bad_low = df['low'].to_numpy() > prices.min(axis=1)
+        report['ohlc_inconsistent_rows'] = int((bad_high | bad_low).sum())
+
+    if 'close' in df.columns and len(df) > 2:
+        returns = np.diff(df['close'].to_numpy()) / df['close'].to_numpy()[:-1]
+        report['annualized_volatility'] = float(np.nanstd(returns, ddof=1) * np.sqrt(252))
+
+    if 'volume' in df.columns and len(df):
+        volume = df['volume'].to_numpy()
+        report['zero_volume_days'] = int((volume == 0).sum())
+        report['average_volume'] = float(np.nanmean(volume))
+
+    if plot_dir is not None:
+        token = os.path.splitext(os.path.basename(file_path))[0]
+        report['plot'] = os.path.join(plot_dir, f"{token}_price_volume_history.png")
+        plot_price_volume(df, report['plot'])
+
+    return report
+
+def _scan_file_safe(args):
+    file_path, plot_dir = args
+    try:
+        return scan_file(file_path, plot_dir)
+    except Exception as e:
+        return {'file': os.path.basename(file_path), 'error': str(e)}
+
+def scan_universe(data_dir='.', pattern='*.csv', output='quality_report.json', plot_dir=None, max_workers=None):
+    """
+    Scan every token CSV in a directory concurrently and write one consolidated report.
+
+    :param data_dir: Directory holding the token CSV files
+    :param pattern: Glob pattern for the files to scan (default all CSVs)
+    :param output: Report path ending in .json or .parquet, or None to skip writing
+    :param plot_dir: Directory for per-token PNGs, or None to skip the plot stage
+    :param max_workers: Number of worker processes (default: one per CPU)
+    :return: Dictionary report keyed by token
+    """
+    files = sorted(glob.glob(os.path.join(data_dir, pattern)))
+    if plot_dir is not None:
+        os.makedirs(plot_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        reports = list(executor.map(_scan_file_safe, [(f, plot_dir) for f in files]))
+
+    universe = {
+        'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'tokens': {os.path.splitext(r['file'])[0]: r for r in reports},
+    }
+
+    if output is not None:
+        if output.endswith('.parquet'):
+            report_to_frame(universe).to_parquet(output, index=False)
+        else:
+            with open(output, 'w') as f:
+                json.dump(universe, f, indent=2)
+
+    return universe
+
+def report_to_frame(universe):
+    """Flatten a universe report into one row per (token, column) for columnar storage."""
+    rows = []
+    for token, report in universe['tokens'].items():
+        file_fields = {k: v for k, v in report.items() if k not in ('column_stats', 'columns')}
+        for col, stats in report.get('column_stats', {}).items():
+            row = {'token': token, 'column': col, **file_fields}
+            row.update({k: v for k, v in stats.items() if not k.endswith('_dates')})
+            row['extreme_outlier_dates'] = ','.join(stats.get('extreme_outlier_dates', []))
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--all':
+        # Usage: python dataScanner.py --all [output.json|output.parquet] [plot_dir]
+        output = sys.argv[2] if len(sys.argv) > 2 else 'quality_report.json'
+        plot_dir = sys.argv[3] if len(sys.argv) > 3 else None
+        universe = scan_universe('.', output=output, plot_dir=plot_dir)
+        print(f"Scanned {len(universe['tokens'])} files, report saved to {output}")
+    else:
+        # Call the function with our CSV file path
+        analyze_csv(sys.argv[1] if len(sys.argv) > 1 else 'WRT.csv')
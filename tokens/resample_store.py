@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Precomputed weekly, monthly and custom-bucket candles stored next to the daily data.
+
+Bars are built with the usual OHLC aggregation (first open, max high, min low, last close,
+summed volume) and labelled with the start of their bucket. Buckets are anchored to fixed
+calendar points (Mondays, month starts, the Unix epoch for fixed-length buckets like '3D'),
+so recomputing only the tail of the history gives exactly the same bars as a full rebuild.
+When new daily rows arrive, only the last stored bar and anything after it are recomputed.
+
+Stored files use the tokens/*.csv format and live in tokens/resampled/{TOKEN}_{timeframe}.csv.
+"""
+
+import glob
+import os
+import sys
+
+import pandas as pd
+
+import schemas
+
+OHLCV_AGG = {
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'volume': 'sum',
+}
+
+# Timeframe name -> pandas offset alias; any other alias such as '3D' or 'QS' also works
+TIMEFRAMES = {
+    'weekly': 'W-MON',
+    'monthly': 'MS',
+}
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def resample_ohlcv(daily, rule):
+    """
+    Aggregate daily candles into larger buckets.
+
+    :param daily: Canonical OHLCV DataFrame indexed by date (see schemas.load)
+    :param rule: Timeframe name from TIMEFRAMES or a pandas offset alias
+    :return: DataFrame of bars labelled with their bucket start; empty buckets are dropped
+    """
+    offset = pd.tseries.frequencies.to_offset(TIMEFRAMES.get(rule, rule))
+    kwargs = {'closed': 'left', 'label': 'left'}
+    if isinstance(offset, pd.offsets.Day):
+        # Since pandas 3 Day is a calendar offset that ignores origin; the same number of hours is fixed-length
+        offset = pd.offsets.Hour(24 * offset.n)
+    if isinstance(offset, pd.offsets.Tick):
+        # Fixed-length buckets such as '3D' would otherwise be anchored to the first row
+        kwargs['origin'] = 'epoch'
+    bars = daily[list(OHLCV_AGG)].resample(offset, **kwargs).agg(OHLCV_AGG)
+    return bars.dropna(subset=['open'])
+
+
+def update_bars(bars, daily, rule):
+    """
+    Bring stored bars up to date with the daily history.
+
+    Only the daily rows from the start of the last stored bar onwards are aggregated,
+    so the cost depends on the number of new rows, not on the length of the history.
+
+    :param bars: Previously stored bars (may be None or empty)
+    :param daily: Canonical OHLCV DataFrame covering at least the start of the last stored bar
+    :param rule: Timeframe name or pandas offset alias used for the stored bars
+    :return: Updated bars
+    """
+    if bars is None or bars.empty:
+        return resample_ohlcv(daily, rule)
+
+    last_start = bars.index[-1]
+    if daily.index[0] > last_start:
+        raise ValueError(f"Daily rows start at {daily.index[0]:%Y-%m-%d}, but the last stored bar "
+                         f"starts at {last_start:%Y-%m-%d}; pass the rows of that bucket as well")
+    tail = daily.iloc[daily.index.searchsorted(last_start, side='left'):]
+    if tail.empty:
+        return bars
+    return pd.concat([bars.loc[:last_start].iloc[:-1], resample_ohlcv(tail, rule)])
+
+
+class ResampleStore:
+    """
+    Keep resampled candles for every token on disk and update them incrementally.
+
+    :param data_dir: Directory with the daily token CSVs (default: this folder)
+    :param store_dir: Directory for the resampled CSVs (default: data_dir/resampled)
+    :param timeframes: Timeframe names or offset aliases to maintain
+    """
+
+    def __init__(self, data_dir=DATA_DIR, store_dir=None, timeframes=('weekly', 'monthly')):
+        self.data_dir = data_dir
+        self.store_dir = store_dir or os.path.join(data_dir, 'resampled')
+        self.timeframes = tuple(timeframes)
+
+    def path(self, token, timeframe):
+        return os.path.join(self.store_dir, f"{token}_{timeframe}.csv")
+
+    def get(self, token, timeframe):
+        """Load stored bars for a token, or None if they have not been built yet."""
+        path = self.path(token, timeframe)
+        if not os.path.exists(path):
+            return None
+        return schemas.load(path, 'token_csv')
+
+    def update(self, token, daily=None, rebuild=False):
+        """
+        Update every timeframe of one token from its daily data.
+
+        :param token: Ticker, e.g. 'WMT'
+        :param daily: Daily history already in memory; by default the token CSV in data_dir is read
+        :param rebuild: Recompute all bars instead of only the tail (use after history corrections)
+        :return: Dict timeframe -> bars
+        """
+        if daily is None:
+            daily = schemas.load(os.path.join(self.data_dir, f"{token}.csv"))
+        os.makedirs(self.store_dir, exist_ok=True)
+
+        updated = {}
+        for timeframe in self.timeframes:
+            bars = None if rebuild else self.get(token, timeframe)
+            bars = update_bars(bars, daily, timeframe)
+            schemas.to_token_csv(bars, self.path(token, timeframe))
+            updated[timeframe] = bars
+        return updated
+
+    def update_all(self, tokens=None, rebuild=False):
+        """Update every token CSV in data_dir (or the given tickers)."""
+        if tokens is None:
+            tokens = [os.path.splitext(os.path.basename(p))[0]
+                      for p in sorted(glob.glob(os.path.join(self.data_dir, '*.csv')))]
+        return {token: self.update(token, rebuild=rebuild) for token in tokens}
+
+
+if __name__ == "__main__":
+    # Usage: python resample_store.py [TICKER ...] [--rebuild]
+    args = [a for a in sys.argv[1:] if a != '--rebuild']
+    store = ResampleStore()
+    results = store.update_all(args or None, rebuild='--rebuild' in sys.argv)
+    for token, bars in results.items():
+        print(f"{token}: " + ", ".join(f"{tf} {len(b)} bars" for tf, b in bars.items()))
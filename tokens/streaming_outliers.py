@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Online outlier detection for candles and trades arriving one at a time.
+
+outlier_detection.py flags outliers against the mean and standard deviation of the
+full history, which is not available on a live feed. The detectors below only keep
+a fixed-size window of recent values, so each update costs the same no matter how
+long the feed has been running:
+
+* RollingZScoreDetector - distance from the rolling mean in rolling standard deviations, O(1)
+* RollingMADDetector - distance from the rolling median in rolling MADs, O(log w) lookups
+* HampelDetector - MAD detector that also returns the rolling median as a replacement value
+
+Every detector scores a new value against the window of previous values and then adds it
+to the window. Until min_periods values have been seen, the score is NaN and nothing is flagged.
+"""
+
+import json
+import math
+from bisect import bisect_left, insort
+from collections import deque
+
+import numpy as np
+
+# Scale factor making the MAD a consistent estimator of the standard deviation for normal data
+MAD_SCALE = 1.4826
+
+
+class RollingZScoreDetector:
+    """Flag values more than threshold rolling standard deviations away from the rolling mean."""
+
+    def __init__(self, window=20, threshold=3.0, min_periods=None):
+        self.window = window
+        self.threshold = threshold
+        self.min_periods = min_periods or window
+        self._values = deque()
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def score(self, value):
+        n = len(self._values)
+        if n < max(self.min_periods, 2):
+            return math.nan
+        std = math.sqrt(max(self._m2, 0.0) / (n - 1))
+        if std == 0:
+            return 0.0 if value == self._mean else math.inf
+        return (value - self._mean) / std
+
+    def update(self, value):
+        """
+        Score one value against the window and add it to the window.
+
+        :param value: New observation
+        :return: Tuple (score, is_outlier)
+        """
+        score = self.score(value)
+        self._push(value)
+        return score, abs(score) > self.threshold
+
+    def update_many(self, values):
+        """Feed a batch of values in order and return arrays of scores and outlier flags."""
+        results = [self.update(v) for v in values]
+        scores = np.array([r[0] for r in results], dtype=float)
+        flags = np.array([r[1] for r in results], dtype=bool)
+        return scores, flags
+
+    def _push(self, value):
+        # Sliding Welford update: add the new value, then remove the oldest one
+        self._values.append(value)
+        n = len(self._values)
+        delta = value - self._mean
+        self._mean += delta / n
+        self._m2 += delta * (value - self._mean)
+        if n > self.window:
+            old = self._values.popleft()
+            new_mean = (n * self._mean - old) / (n - 1)
+            self._m2 -= (old - self._mean) * (old - new_mean)
+            self._mean = new_mean
+
+
+class SortedWindow:
+    """Fixed-size sliding window kept in sorted order for median and MAD lookups."""
+
+    def __init__(self, window):
+        self.window = window
+        self._fifo = deque()
+        self._sorted = []
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def push(self, value):
+        self._fifo.append(value)
+        insort(self._sorted, value)
+        if len(self._fifo) > self.window:
+            old = self._fifo.popleft()
+            del self._sorted[bisect_left(self._sorted, old)]
+
+    def median(self):
+        a = self._sorted
+        n = len(a)
+        mid = n // 2
+        return a[mid] if n % 2 else 0.5 * (a[mid - 1] + a[mid])
+
+    def mad(self, median=None):
+        """
+        Median absolute deviation without materializing the deviations.
+
+        The deviations to the left and to the right of the median are each already sorted,
+        so the middle deviation is the k-th element of two sorted sequences and is found
+        by binary search.
+        """
+        a = self._sorted
+        n = len(a)
+        m = self.median() if median is None else median
+        split = bisect_left(a, m)
+
+        def left(i):
+            return m - a[split - 1 - i]
+
+        def right(j):
+            return a[split + j] - m
+
+        lo = _kth_of_two(left, split, right, n - split, (n - 1) // 2)
+        if n % 2:
+            return lo
+        return 0.5 * (lo + _kth_of_two(left, split, right, n - split, n // 2))
+
+
+def _kth_of_two(first, len_first, second, len_second, k):
+    # k-th smallest (0-based) of two ascending sequences given by accessor functions
+    take = k + 1
+    lo, hi = max(0, take - len_second), min(take, len_first)
+    while lo < hi:
+        i = (lo + hi) // 2
+        if first(i) < second(take - i - 1):
+            lo = i + 1
+        else:
+            hi = i
+    candidates = []
+    if lo > 0:
+        candidates.append(first(lo - 1))
+    if take - lo > 0:
+        candidates.append(second(take - lo - 1))
+    return max(candidates)
+
+
+class RollingMADDetector:
+    """Flag values more than threshold scaled MADs away from the rolling median."""
+
+    def __init__(self, window=20, threshold=3.0, min_periods=None):
+        self.window = window
+        self.threshold = threshold
+        self.min_periods = min_periods or window
+        self._window = SortedWindow(window)
+
+    def baseline(self):
+        """Return the current rolling median and scaled MAD, or (nan, nan) during warm-up."""
+        if len(self._window) < self.min_periods:
+            return math.nan, math.nan
+        median = self._window.median()
+        return median, MAD_SCALE * self._window.mad(median)
+
+    def score(self, value):
+        median, scale = self.baseline()
+        if math.isnan(median):
+            return math.nan
+        if scale == 0:
+            return 0.0 if value == median else math.inf
+        return (value - median) / scale
+
+    def update(self, value):
+        """
+        Score one value against the window and add it to the window.
+
+        :param value: New observation
+        :return: Tuple (score, is_outlier)
+        """
+        score = self.score(value)
+        self._window.push(value)
+        return score, abs(score) > self.threshold
+
+    def update_many(self, values):
+        """Feed a batch of values in order and return arrays of scores and outlier flags."""
+        results = [self.update(v) for v in values]
+        scores = np.array([r[0] for r in results], dtype=float)
+        flags = np.array([r[1] for r in results], dtype=bool)
+        return scores, flags
+
+
+class HampelDetector(RollingMADDetector):
+    """
+    Hampel filter: a MAD detector that also supplies a cleaned value.
+
+    Flagged values are replaced by the rolling median. With replace=True the replacement,
+    not the raw value, enters the window, so a burst of bad ticks cannot drag the median.
+    """
+
+    def __init__(self, window=20, threshold=3.0, min_periods=None, replace=False):
+        super().__init__(window, threshold, min_periods)
+        self.replace = replace
+
+    def filter(self, value):
+        """
+        Score one value and return the cleaned value alongside the score.
+
+        :param value: New observation
+        :return: Tuple (score, is_outlier, cleaned_value)
+        """
+        median, _ = self.baseline()
+        score = self.score(value)
+        is_outlier = abs(score) > self.threshold
+        cleaned = median if is_outlier else value
+        self._window.push(cleaned if self.replace else value)
+        return score, is_outlier, cleaned
+
+    def update(self, value):
+        score, is_outlier, _ = self.filter(value)
+        return score, is_outlier
+
+
+DETECTORS = {
+    'zscore': RollingZScoreDetector,
+    'mad': RollingMADDetector,
+    'hampel': HampelDetector,
+}
+
+
+class CandleOutlierMonitor:
+    """
+    Run one detector per field over a stream of candles or trades.
+
+    Candles are dicts with open/high/low/close/volume keys, as returned by the API
+    (snek.json) or read from the token CSVs. Trades are the dicts recorded by
+    DownloadTradesAndOrderBookSnapshots in bots/download_order_book_and_trades.py
+    ({"ts", "price", "q_base", "side"}).
+    """
+
+    def __init__(self, fields=('close',), method='mad', **detector_kwargs):
+        self.fields = tuple(fields)
+        self.detectors = {field: DETECTORS[method](**detector_kwargs) for field in self.fields}
+
+    def update(self, candle):
+        """
+        Score one candle.
+
+        :param candle: Dict holding at least the monitored fields
+        :return: Dict field -> (score, is_outlier)
+        """
+        return {field: self.detectors[field].update(float(candle[field])) for field in self.fields}
+
+    def update_batch(self, candles):
+        """Score a list of candles in order and return the per-candle results."""
+        return [self.update(candle) for candle in candles]
+
+    def is_outlier(self, candle):
+        """Score one candle and return True if any monitored field is flagged."""
+        return any(flag for _, flag in self.update(candle).values())
+
+
+def read_trades(file_path):
+    """Yield trade dicts from a newline-delimited JSON trade dump, skipping blank lines."""
+    with open(file_path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def scan_trade_file(file_path, method='mad', window=100, threshold=5.0):
+    """
+    Stream a recorded trade dump through a price detector.
+
+    :param file_path: Path to a *_trades_YYYY-MM-DD.txt file written by the downloader bot
+    :param method: 'zscore', 'mad' or 'hampel'
+    :param window: Number of previous trades in the rolling window
+    :param threshold: Flag trades whose score exceeds this many (robust) standard deviations
+    :return: List of (trade, score) for every flagged trade
+    """
+    monitor = CandleOutlierMonitor(fields=('price',), method=method, window=window, threshold=threshold)
+    flagged = []
+    for trade in read_trades(file_path):
+        score, is_outlier = monitor.update(trade)['price']
+        if is_outlier:
+            flagged.append((trade, score))
+    return flagged
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    # Replay a token history as if the candles were arriving live
+    df = pd.read_csv('SNEK.csv')
+    monitor = CandleOutlierMonitor(fields=('close', 'volume'), method='hampel', window=30, threshold=4.0)
+    for candle in df.to_dict('records'):
+        for field, (score, is_outlier) in monitor.update(candle).items():
+            if is_outlier:
+                print(f"{candle['date']} {field}: {candle[field]:.6f} (score {score:.1f})")
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Build OHLCV bars from the trade dumps recorded by the order book and trades downloader.
+
+DownloadTradesAndOrderBookSnapshots (bots/download_order_book_and_trades.py) writes one
+newline-delimited JSON file per pair and day, named {exchange}_{pair}_trades_{YYYY-MM-DD}.txt,
+with one {"ts", "price", "q_base", "side"} record per trade. This module reads those files in
+fixed-size chunks and turns them into bars in the tokens/*.csv format.
+
+Every bar type assigns each trade a bar id that only ever increases:
+
+* time bars - floor(ts / seconds), so buckets are aligned to the Unix epoch
+* volume bars - the bar a trade completes when the cumulative base quantity passes a multiple of the threshold
+* dollar bars - the same on the cumulative quote value (price * q_base)
+
+Within a chunk, trades with the same id are aggregated with NumPy; only the last, still open bar
+is carried into the next chunk, so memory stays constant however large the file is.
+Files are processed in parallel. Volume and dollar bars restart at the beginning of every daily
+file so each file can be aggregated on its own; time bars that straddle two files are merged.
+"""
+
+import csv
+import glob
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
+
+import numpy as np
+
+TRADE_FILE_PATTERN = re.compile(r'^(?P<exchange>.+)_(?P<pair>[^_]+)_trades_(?P<date>\d{4}-\d{2}-\d{2})\.txt$')
+
+BAR_FIELDS = ['date', 'open', 'high', 'low', 'close', 'volume']
+
+
+def read_trade_chunks(file_path, chunk_size=100000):
+    """
+    Yield (ts, price, q_base) arrays for consecutive chunks of a trade dump.
+
+    :param file_path: Path to a *_trades_YYYY-MM-DD.txt file
+    :param chunk_size: Number of lines read per chunk
+    """
+    with open(file_path) as f:
+        while True:
+            lines = list(islice(f, chunk_size))
+            if not lines:
+                return
+            trades = [json.loads(line) for line in lines if line.strip()]
+            if trades:
+                yield (np.array([t['ts'] for t in trades], dtype=float),
+                       np.array([t['price'] for t in trades], dtype=float),
+                       np.array([t['q_base'] for t in trades], dtype=float))
+
+
+class BarAggregator:
+    """
+    Streaming time, volume or dollar bar builder.
+
+    :param kind: 'time', 'volume' or 'dollar'
+    :param size: Seconds per bar for time bars, base quantity for volume bars, quote value for dollar bars
+    """
+
+    def __init__(self, kind='time', size=3600):
+        if kind not in ('time', 'volume', 'dollar'):
+            raise ValueError(f"Unknown bar kind: {kind}")
+        self.kind = kind
+        self.size = float(size)
+        self._cumulative = 0.0
+        self._open_bar = None
+
+    def _bar_ids(self, ts, price, qty):
+        if self.kind == 'time':
+            return np.floor(ts / self.size)
+        amount = qty if self.kind == 'volume' else price * qty
+        cumulative = self._cumulative + np.cumsum(amount)
+        self._cumulative = cumulative[-1]
+        # A trade that reaches a multiple of the threshold exactly closes that bar
+        return np.ceil(cumulative / self.size) - 1
+
+    def add(self, ts, price, qty):
+        """
+        Add a chunk of trades.
+
+        :return: List of completed bars as (bar_id, start_ts, end_ts, open, high, low, close, volume)
+        """
+        if len(ts) == 0:
+            return []
+        ids = self._bar_ids(ts, price, qty)
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        ends = np.r_[starts[1:], len(ids)] - 1
+
+        bars = list(zip(
+            ids[starts], ts[starts], ts[ends],
+            price[starts],
+            np.maximum.reduceat(price, starts),
+            np.minimum.reduceat(price, starts),
+            price[ends],
+            np.add.reduceat(qty, starts),
+        ))
+        if self._open_bar is not None:
+            if bars[0][0] == self._open_bar[0]:
+                bars[0] = merge_bars(self._open_bar, bars[0])
+            else:
+                bars.insert(0, self._open_bar)
+        self._open_bar = bars.pop()
+        return bars
+
+    def flush(self):
+        """Return the last open bar (if any) and reset the aggregator."""
+        bar, self._open_bar, self._cumulative = self._open_bar, None, 0.0
+        return [bar] if bar is not None else []
+
+
+def merge_bars(first, second):
+    return (first[0], first[1], second[2], first[3], max(first[4], second[4]),
+            min(first[5], second[5]), second[6], first[7] + second[7])
+
+
+def aggregate_file(file_path, kind='time', size=3600, chunk_size=100000):
+    """
+    Aggregate one trade dump into bars.
+
+    :return: List of bars as (bar_id, start_ts, end_ts, open, high, low, close, volume)
+    """
+    aggregator = BarAggregator(kind, size)
+    bars = []
+    for ts, price, qty in read_trade_chunks(file_path, chunk_size):
+        bars.extend(aggregator.add(ts, price, qty))
+    bars.extend(aggregator.flush())
+    return bars
+
+
+def _aggregate_file_args(args):
+    return aggregate_file(*args)
+
+
+def _format_bar_date(bar, kind, size):
+    if kind == 'time':
+        # Time bars are labelled with the bucket start, like the daily and resampled candles
+        stamp = bar[0] * size
+    else:
+        # Volume and dollar bars are labelled with the trade that completed them
+        stamp = bar[2]
+    moment = datetime.fromtimestamp(stamp, tz=timezone.utc)
+    if kind == 'time' and size % 86400 == 0:
+        return moment.strftime('%Y-%m-%d')
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def find_trade_files(data_dir, pairs=None):
+    """Group trade dumps in a directory by (exchange, pair), each list sorted by date."""
+    grouped = defaultdict(list)
+    for path in glob.glob(os.path.join(data_dir, '*_trades_*.txt')):
+        match = TRADE_FILE_PATTERN.match(os.path.basename(path))
+        if match and (pairs is None or match['pair'] in pairs):
+            grouped[(match['exchange'], match['pair'])].append((match['date'], path))
+    return {key: [path for _, path in sorted(files)] for key, files in grouped.items()}
+
+
+def build_bars(data_dir, output_dir, kind='time', size=3600, pairs=None, chunk_size=100000, max_workers=None):
+    """
+    Turn every recorded trade dump in a directory into bar CSVs, one per pair.
+
+    Every (pair, day) file is aggregated in its own worker process; the results are stitched
+    together in date order and written as {exchange}_{pair}_{kind}_{size}.csv.
+
+    :param data_dir: Hummingbot data directory with the trade dumps
+    :param output_dir: Directory for the bar CSVs
+    :param kind: 'time', 'volume' or 'dollar'
+    :param size: Seconds, base quantity or quote value per bar
+    :param pairs: Optional list of trading pairs to include, e.g. ['ETH-USDT']
+    :param chunk_size: Number of trades read per chunk
+    :param max_workers: Number of worker processes (default: one per CPU)
+    :return: Dict (exchange, pair) -> output file path
+    """
+    files = find_trade_files(data_dir, pairs)
+    jobs = [(path, kind, size, chunk_size) for paths in files.values() for path in paths]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = dict(zip([job[0] for job in jobs], executor.map(_aggregate_file_args, jobs)))
+
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = {}
+    for (exchange, pair), paths in files.items():
+        output = os.path.join(output_dir, f"{exchange}_{pair}_{kind}_{size:g}.csv")
+        with open(output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(BAR_FIELDS)
+            previous = None
+            for path in paths:
+                for bar in results[path]:
+                    if previous is not None and kind == 'time' and bar[0] == previous[0]:
+                        previous = merge_bars(previous, bar)
+                        continue
+                    if previous is not None:
+                        writer.writerow([_format_bar_date(previous, kind, size), *previous[3:]])
+                    previous = bar
+            if previous is not None:
+                writer.writerow([_format_bar_date(previous, kind, size), *previous[3:]])
+        outputs[(exchange, pair)] = output
+    return outputs
+
+
+if __name__ == "__main__":
+    # Usage: python trade_bars.py <data_dir> <output_dir> [time|volume|dollar] [size]
+    if len(sys.argv) < 3:
+        print("Usage: python trade_bars.py <data_dir> <output_dir> [time|volume|dollar] [size]")
+        sys.exit(1)
+    kind = sys.argv[3] if len(sys.argv) > 3 else 'time'
+    size = float(sys.argv[4]) if len(sys.argv) > 4 else 3600
+    for (exchange, pair), path in build_bars(sys.argv[1], sys.argv[2], kind, size).items():
+        print(f"{exchange} {pair}: {path}")